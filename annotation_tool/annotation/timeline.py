@@ -1,6 +1,5 @@
 from collections import namedtuple
-import time
-from typing import Tuple
+from typing import Optional, Tuple
 
 import PyQt6.QtCore as qtc
 import PyQt6.QtGui as qtg
@@ -129,6 +128,12 @@ class QTimeLine(qtw.QWidget):
 
         self.samples = []
         self.current_sample = None
+        self._samples_version = 0  # incremented whenever the samples change
+
+        # ticks and samples are rendered into a pixmap, which is only redrawn
+        # when its key changes. Repaints for the pointer or mouse reuse it.
+        self._static_layer = None
+        self._static_layer_key = None
 
         self.backgroundColor = qtg.QColor(60, 63, 65)
         self.textColor = qtg.QColor(187, 187, 187)
@@ -199,13 +204,15 @@ class QTimeLine(qtw.QWidget):
     @qtc.pyqtSlot(int)
     def set_position(self, pos):
         assert 0 <= pos < self.n_frames
+        old_frame_idx = self.frame_idx
         self.frame_idx = pos
-        self.update()
+        self.update_overlay(old_frame_idx=old_frame_idx)
 
     @qtc.pyqtSlot(list, Sample)
     def set_samples(self, samples, selected_sample):
         self.samples = samples
         self.current_sample = selected_sample
+        self._samples_version += 1
         self.update()
 
     # mouse scroll event
@@ -231,6 +238,7 @@ class QTimeLine(qtw.QWidget):
             e.ignore()
 
     def mouseMoveEvent(self, e):
+        old_frame_idx, old_mouse_pos = self.frame_idx, self.pos
         self.pos = e.pos()
 
         # if mouse is being pressed, update pointer
@@ -242,7 +250,7 @@ class QTimeLine(qtw.QWidget):
             self.frame_idx = self.scaler.pixel_to_frame(x) + self.lower
             self.position_changed.emit(self.frame_idx)
 
-        self.update()
+        self.update_overlay(old_frame_idx, old_mouse_pos)
 
     def mousePressEvent(self, e):
         if e.button() == qtc.Qt.MouseButton.LeftButton:
@@ -263,7 +271,7 @@ class QTimeLine(qtw.QWidget):
 
     def leaveEvent(self, e):
         self.is_in = False
-        self.update()
+        self.update_overlay(old_mouse_pos=self.pos)
 
     def resizeEvent(self, event: qtg.QResizeEvent) -> None:
         qtw.QWidget.resizeEvent(self, event)
@@ -274,6 +282,42 @@ class QTimeLine(qtw.QWidget):
         self.update_visible_range()
         super().update()
 
+    def update_overlay(
+        self,
+        old_frame_idx: Optional[int] = None,
+        old_mouse_pos: Optional[qtc.QPoint] = None,
+    ) -> None:
+        """
+        Repaints only the areas of the pointer and the mouse line, at their old
+        and their current positions. Falls back to a full repaint if the visible
+        range has to scroll.
+
+        Args:
+            old_frame_idx (Optional[int]): The position of the pointer before the change.
+            old_mouse_pos (Optional[qtc.QPoint]): The mouse position before the change.
+        """
+        lower = self.lower
+        self.update_visible_range()
+        if self.lower != lower:
+            super().update()
+            return
+
+        damaged = qtg.QRegion(self._pointer_rect(self.frame_idx))
+        if self.pos is not None:
+            damaged += self._mouse_rect(self.pos)
+        if old_frame_idx is not None:
+            damaged += self._pointer_rect(old_frame_idx)
+        if old_mouse_pos is not None:
+            damaged += self._mouse_rect(old_mouse_pos)
+        super().update(damaged)
+
+    def _pointer_rect(self, frame_idx: int) -> qtc.QRect:
+        x = self.scaler.frame_to_pixel(frame_idx - self.lower)
+        return qtc.QRect(x - 11, 0, 23, self.height())
+
+    def _mouse_rect(self, pos: qtc.QPoint) -> qtc.QRect:
+        return qtc.QRect(pos.x() - 1, 0, 3, self.height())
+
     def _draw_time(self, qp, dist):
         # Draw time
         pos = dist
@@ -416,36 +460,66 @@ class QTimeLine(qtw.QWidget):
                 raise ValueError(f"Unknown timeline design: {settings.timeline_design}")
 
     def paintEvent(self, event):
+        # init painter, Qt clips it to the damaged region
+        qp = qtg.QPainter()
+        qp.begin(self)
+        qp.drawPixmap(0, 0, self.static_layer())
+        qp.setRenderHint(qtg.QPainter.RenderHint.Antialiasing)
+
+        self._draw_mouse_pos(qp)
+        self._draw_pointer(qp)
+
+        qp.end()
+
+    def static_layer(self) -> qtg.QPixmap:
+        """
+        Returns the ticks and the samples rendered into a pixmap.
+        The pixmap is only redrawn if the samples, the visible range,
+        the size or the appearance of the timeline changed.
+        """
+        key = (
+            self._samples_version,
+            self.scaler.ratio,
+            self.lower,
+            self.width(),
+            self.height(),
+            self.n_frames,
+            self.fps,
+            settings.timeline_design,
+            settings.font_size,
+            self.devicePixelRatioF(),
+        )
+        if key != self._static_layer_key:
+            self._static_layer = self._render_static_layer()
+            self._static_layer_key = key
+        return self._static_layer
+
+    def _render_static_layer(self) -> qtg.QPixmap:
         # step_size between ticks
         dist = 100
 
-        # init painter
+        ratio = self.devicePixelRatioF()
+        layer = qtg.QPixmap(
+            max(1, round(self.width() * ratio)), max(1, round(self.height() * ratio))
+        )
+        layer.setDevicePixelRatio(ratio)
+        layer.fill(qtc.Qt.GlobalColor.transparent)
+
         qp = qtg.QPainter()
-        qp.begin(self)
+        qp.begin(layer)
         qp.setPen(self.textColor)
         qp.setFont(self.font)
         qp.setRenderHint(qtg.QPainter.RenderHint.Antialiasing)
 
         self._draw_time(qp, dist)
         self._draw_lines(qp, dist)
-        self._draw_mouse_pos(qp)
 
-        # This is the bottleneck for drawing the timeline
-        _s_draw = time.perf_counter()  # noqa
+        # This is the bottleneck for drawing the timeline,
+        # the samples are only drawn when the layer changes
         self._draw_samples(qp)
-        _e_draw = time.perf_counter()  # noqa
-        # print(f"Drawing samples took {_e_draw - _s_draw: .4f} seconds")
-
-        # Clear clip path
-        path = qtg.QPainterPath()
-        path.addRect(
-            self.rect().x(), self.rect().y(), self.rect().width(), self.rect().height()
-        )
-        qp.setClipPath(path)
-
-        self._draw_pointer(qp)
 
         qp.end()
+        return layer
 
     @property
     def upper(self):
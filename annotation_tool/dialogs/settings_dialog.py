@@ -4,6 +4,7 @@ import PyQt6.QtCore as qtc
 import PyQt6.QtGui as qtg
 import PyQt6.QtWidgets as qtw
 
+from annotation_tool.media_reader.video_readers import video_backends
 from annotation_tool.settings import settings
 
 
@@ -446,6 +447,49 @@ class DeveloperSettingsDialog(qtw.QDialog):
         self.logging_layout.addWidget(self.logging_level_combobox)
         self.layout.addLayout(self.logging_layout)
 
+        # Video decoding
+        self.video_backend_layout = qtw.QHBoxLayout()
+        self.video_backend_label = qtw.QLabel("Video backend:")
+        self.video_backend_combobox = qtw.QComboBox()
+        self.video_backend_combobox.addItems(["auto"] + video_backends())
+        idx = self.video_backend_combobox.findText(settings.video_backend)
+        self.video_backend_combobox.setCurrentIndex(max(0, idx))
+        self.video_backend_combobox.currentTextChanged.connect(
+            self.change_video_backend
+        )
+        self.video_backend_layout.addWidget(self.video_backend_label)
+        self.video_backend_layout.addWidget(self.video_backend_combobox)
+        self.layout.addLayout(self.video_backend_layout)
+
+        self.decode_process_layout = qtw.QHBoxLayout()
+        self.decode_process_label = qtw.QLabel("Decode videos in worker processes:")
+        self.decode_process_checkbox = qtw.QCheckBox()
+        self.decode_process_checkbox.setChecked(settings.video_decode_process)
+        self.decode_process_checkbox.toggled.connect(self.change_decode_process)
+        self.decode_process_layout.addWidget(self.decode_process_label)
+        self.decode_process_layout.addWidget(self.decode_process_checkbox)
+        self.layout.addLayout(self.decode_process_layout)
+
+        self.lag_budget_layout = qtw.QHBoxLayout()
+        self.lag_budget_label = qtw.QLabel("Playback lag budget (ms):")
+        self.lag_budget_spinbox = qtw.QSpinBox()
+        self.lag_budget_spinbox.setRange(10, 2000)
+        self.lag_budget_spinbox.setSingleStep(10)
+        self.lag_budget_spinbox.setValue(settings.playback_lag_budget)
+        self.lag_budget_spinbox.valueChanged.connect(self.change_lag_budget)
+        self.lag_budget_layout.addWidget(self.lag_budget_label)
+        self.lag_budget_layout.addWidget(self.lag_budget_spinbox)
+        self.layout.addLayout(self.lag_budget_layout)
+
+        self.hud_layout = qtw.QHBoxLayout()
+        self.hud_label = qtw.QLabel("Show playback performance overlay:")
+        self.hud_checkbox = qtw.QCheckBox()
+        self.hud_checkbox.setChecked(settings.show_performance_hud)
+        self.hud_checkbox.toggled.connect(self.change_show_hud)
+        self.hud_layout.addWidget(self.hud_label)
+        self.hud_layout.addWidget(self.hud_checkbox)
+        self.layout.addLayout(self.hud_layout)
+
         # Accept, Reset buttons
         self.button_layout = qtw.QHBoxLayout()
         self.accept_button = qtw.QPushButton("Accept")
@@ -462,9 +506,36 @@ class DeveloperSettingsDialog(qtw.QDialog):
         settings.logging_level = self._idx_to_log_lvl[idx]
         self.settings_changed.emit()
 
+    def change_video_backend(self, value: str) -> None:
+        settings.video_backend = value
+        self.settings_changed.emit()
+
+    def change_decode_process(self, checked: bool) -> None:
+        settings.video_decode_process = checked
+
+    def change_lag_budget(self, value: int) -> None:
+        settings.playback_lag_budget = value
+
+    def change_show_hud(self, checked: bool) -> None:
+        settings.show_performance_hud = checked
+        self.settings_changed.emit()
+
     def reset_settings(self):
         default_logging_level = settings.get_default("logging_level")
         self.logging_level_combobox.setCurrentIndex(
             self._log_lvl_to_idx[default_logging_level]
         )
+        self.video_backend_combobox.setCurrentIndex(
+            max(
+                0,
+                self.video_backend_combobox.findText(
+                    settings.get_default("video_backend")
+                ),
+            )
+        )
+        self.decode_process_checkbox.setChecked(
+            settings.get_default("video_decode_process")
+        )
+        self.lag_budget_spinbox.setValue(settings.get_default("playback_lag_budget"))
+        self.hud_checkbox.setChecked(settings.get_default("show_performance_hud"))
         self.settings_changed.emit()
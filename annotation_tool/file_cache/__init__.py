@@ -1,3 +1,4 @@
 from ._file_cache import application_path  # noqa: F401
+from ._file_cache import application_subdir  # noqa: F401
 from ._file_cache import cached  # noqa: F401
 from ._file_cache import get_dir  # noqa: F401
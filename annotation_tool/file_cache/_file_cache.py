@@ -43,6 +43,19 @@ def application_path() -> str:
     return __application_path__
 
 
+def application_subdir(name: str) -> str:
+    """
+    Returns the path to a subdirectory of the application path.
+    The directory is created if it does not exist yet.
+
+    Args:
+        name: The name of the subdirectory.
+    """
+    path = os.path.join(__application_path__, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
 def get_size_in_bytes() -> int:
     """
     Returns the size of the cache in bytes.
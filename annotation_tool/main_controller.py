@@ -11,6 +11,7 @@ import PyQt6.QtWidgets as qtw
 
 from annotation_tool.annotation.timeline import QTimeLine
 from annotation_tool.media_reader import meta_data
+from annotation_tool.media_reader.video_readers import set_video_backend
 import annotation_tool.network.controller as network
 from annotation_tool.settings import settings
 
@@ -201,6 +202,8 @@ class MainApplication(qtw.QApplication):
     @qtc.pyqtSlot()
     def settings_changed(self):
         filehandler.set_logging_level(settings.logging_level)
+        set_video_backend(settings.video_backend)
+        self.media_player.set_hud_visible(settings.show_performance_hud)
 
     def update_theme(self):
         self.setStyle("Fusion")
@@ -329,6 +332,7 @@ def except_hook(cls, exception, traceback):
 def main():
     lvl = settings.logging_level
     filehandler.set_logging_level(lvl)
+    set_video_backend(settings.video_backend)
 
     sys.excepthook = except_hook
     app = MainApplication(sys.argv)
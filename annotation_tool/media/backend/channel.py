@@ -0,0 +1,50 @@
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+import PyQt6.QtCore as qtc
+
+
+class CoalescingChannel(qtc.QObject):
+    """
+    Latest-wins channel for passing values (e.g. positions) to a worker thread.
+    Only the latest value is kept, values the consumer did not take in time
+    are discarded instead of piling up in the event queue.
+    ready is emitted once per batch of values, connect it to the consumer
+    with a queued connection and call take there.
+    """
+
+    ready = qtc.pyqtSignal()
+
+    def __init__(self, value: Any = None):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._value = value
+        self._put_time = None  # when the not yet taken value was put
+        self._pending = False
+
+        self.coalesced = 0  # values that were replaced before being taken
+
+    def put(self, value: Any) -> None:
+        with self._lock:
+            self._value = value
+            if self._pending:
+                self.coalesced += 1
+                return
+            self._put_time = time.perf_counter()
+            self._pending = True
+        self.ready.emit()
+
+    def take(self) -> Tuple[Any, Optional[float]]:
+        """
+        Returns the latest value and the time (time.perf_counter) the consumer
+        was notified about it. The time is None if the value was taken before.
+        """
+        with self._lock:
+            put_time, self._put_time = self._put_time, None
+            self._pending = False
+            return self._value, put_time
+
+    @property
+    def pending(self) -> bool:
+        return self._pending
@@ -1,15 +1,19 @@
 import enum
 import logging
+from typing import List
 
 import PyQt6.QtCore as qtc
 import PyQt6.QtGui as qtg
 import PyQt6.QtWidgets as qtw
 
+from annotation_tool.media.backend.hud import PerformanceHUD
 from annotation_tool.media.backend.player import AbstractMediaPlayer
 from annotation_tool.media.backend.timer import Synchronizer
 from annotation_tool.media.backend.type_specific_player.mocap import MocapPlayer
 from annotation_tool.media.backend.type_specific_player.video import VideoPlayer
-from annotation_tool.media_reader import media_type_of
+from annotation_tool.media_reader import frame_index_at, frame_timestamp, media_type_of
+from annotation_tool.media_reader.proxy import stop_proxy_builders
+from annotation_tool.settings import settings
 
 media_proxy_map = {}
 
@@ -28,6 +32,9 @@ class MediaProxy(qtc.QObject):
         self.media_widget = media_widget
 
         self._fps = media_widget.fps
+        self._timestamps = media_widget.timestamps
+
+        self.dropped_positions = 0  # positions the synchronizer did not send
 
     @qtc.pyqtSlot(qtc.QObject, int)
     def set_position_(self, proxy, position):
@@ -38,6 +45,10 @@ class MediaProxy(qtc.QObject):
     def position(self):
         return self.media_widget.position
 
+    @property
+    def lag(self):
+        return self.media_widget.lag
+
     @property
     def fps(self):
         return self._fps
@@ -46,6 +57,16 @@ class MediaProxy(qtc.QObject):
     def n_frames(self):
         return self.media_widget.n_frames
 
+    @property
+    def timestamps(self):
+        return self._timestamps
+
+    def timestamp_of(self, idx: int) -> float:
+        return frame_timestamp(idx, self._fps, self._timestamps)
+
+    def index_at(self, ms: float) -> int:
+        return frame_index_at(ms, self._fps, self._timestamps)
+
     @property
     def main_replay_widget(self):
         return self.media_widget._is_main_replay_widget
@@ -75,6 +96,9 @@ class QMediaMainController(qtw.QWidget):
         self.STATE = MediaState.AVAILABLE
         self._open_loading_tasks = 0
 
+        self._replay_speed = 1
+        self._paused = True
+
         self.grid = qtw.QGridLayout(self)
         self.grid.setContentsMargins(0, 0, 0, 10)
         self.MAX_WIDGETS = 4
@@ -88,6 +112,9 @@ class QMediaMainController(qtw.QWidget):
         self._dead_widgets = []
         self._widget_2_path = {}
 
+        self.hud = PerformanceHUD(self.performance_counters, self)
+        self.set_hud_visible(settings.show_performance_hud)
+
     @qtc.pyqtSlot(str, list)
     def load(self, file, additional_media=[]):
         if self.STATE == MediaState.AVAILABLE:
@@ -138,6 +165,12 @@ class QMediaMainController(qtw.QWidget):
 
             widget.offset = offset
 
+            # playback state is needed by the players for reading ahead
+            widget.set_replay_speed(self._replay_speed)
+            widget.set_paused(self._paused)
+            self.replay_speed_changed.connect(widget.set_replay_speed)
+            self.setPaused.connect(widget.set_paused)
+
             if widget.is_main_replay_widget:
                 self.grid.addWidget(widget, 0, 0)
             else:
@@ -200,6 +233,11 @@ class QMediaMainController(qtw.QWidget):
     def remove_replay_source(self, widget, notify=True, ignore_errors=False):
         self.grid.removeWidget(widget)
         self.vbox.removeWidget(widget)
+        try:
+            self.replay_speed_changed.disconnect(widget.set_replay_speed)
+            self.setPaused.disconnect(widget.set_paused)
+        except TypeError:
+            pass  # widget was never connected
         proxy = media_proxy_map.get(id(widget))
         if proxy:
             self.unsubscribe.emit(proxy)
@@ -234,10 +272,12 @@ class QMediaMainController(qtw.QWidget):
 
     @qtc.pyqtSlot()
     def play(self):
+        self._paused = False
         self.setPaused.emit(False)
 
     @qtc.pyqtSlot()
     def pause(self):
+        self._paused = True
         self.setPaused.emit(True)
 
     def closeEvent(self, a0: qtg.QCloseEvent) -> None:
@@ -250,11 +290,38 @@ class QMediaMainController(qtw.QWidget):
 
     @qtc.pyqtSlot(float)
     def set_replay_speed(self, x):
+        self._replay_speed = x
         self.replay_speed_changed.emit(x)
 
     def on_timeout(self, pos):
         self.timeout.emit(pos)
 
+    def performance_counters(self) -> List[dict]:
+        """
+        Returns the performance counters of all players, the main player first.
+        Besides the counters of the players (see PlayerMetrics), each entry holds
+        the target framerate, the decode-to-display lag and the positions
+        the synchronizer dropped for the player.
+        """
+        counters = []
+        widgets = sorted(self.replay_widgets, key=lambda w: not w.is_main_replay_widget)
+        for widget in widgets:
+            values = widget.performance_counters()
+            proxy = media_proxy_map.get(id(widget))
+            values["dropped_positions"] = proxy.dropped_positions if proxy else 0
+            values["target_fps"] = (widget.fps or 0) * self._replay_speed
+            values["lag_ms"] = widget.lag
+            counters.append(values)
+        return counters
+
+    @qtc.pyqtSlot(bool)
+    def set_hud_visible(self, visible):
+        self.hud.setVisible(visible)
+
+    @qtc.pyqtSlot()
+    def toggle_hud(self):
+        self.set_hud_visible(not self.hud.isVisible())
+
     def init_timer(self):
         self.timer_thread = qtc.QThread()
         self.timer_worker = Synchronizer()
@@ -289,4 +356,6 @@ class QMediaMainController(qtw.QWidget):
         for w in self._dead_widgets:
             w.kill()
 
+        stop_proxy_builders()
+
         logging.info("Shut down MediaController successfully")
@@ -0,0 +1,77 @@
+import math
+from typing import Callable, List
+
+import PyQt6.QtCore as qtc
+import PyQt6.QtWidgets as qtw
+
+
+def format_counters(counters: dict) -> str:
+    """
+    Formats the performance counters of one player as a few lines of text.
+    """
+
+    def ms(key):
+        value = counters.get(f"{key}_ms")
+        return "-" if value is None else f"{value:.1f} ms"
+
+    hit_rate = counters.get("cache_hit_rate", math.nan)
+    hit_rate = "-" if math.isnan(hit_rate) else f"{hit_rate:.0%}"
+    return "\n".join(
+        [
+            counters.get("name", ""),
+            f"  fps {counters.get('fps', 0):.1f} / {counters.get('target_fps', 0):.1f}"
+            f"   lag {counters.get('lag_ms', 0):.1f} ms",
+            f"  decode {ms('decode')}   convert {ms('convert')}"
+            f"   upload {ms('upload')}",
+            f"  queue {counters.get('queue_depth', 0)}"
+            f"   dropped frames {counters.get('dropped_frames', 0)}"
+            f" / positions {counters.get('dropped_positions', 0)}",
+            f"  cache hits {hit_rate}",
+        ]
+    )
+
+
+class PerformanceHUD(qtw.QLabel):
+    """
+    Overlay showing the performance counters of all players.
+    The counters are only polled while the overlay is visible.
+    """
+
+    UPDATE_INTERVAL = 500  # ms
+
+    def __init__(self, source: Callable[[], List[dict]], parent=None):
+        super().__init__(parent)
+        self._source = source
+
+        self.setAttribute(qtc.Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setAlignment(
+            qtc.Qt.AlignmentFlag.AlignTop | qtc.Qt.AlignmentFlag.AlignLeft
+        )
+        self.setStyleSheet(
+            "background-color: rgba(0, 0, 0, 160); color: white;"
+            "font-family: monospace; padding: 4px;"
+        )
+
+        self._timer = qtc.QTimer(self)
+        self._timer.setInterval(self.UPDATE_INTERVAL)
+        self._timer.timeout.connect(self.refresh)
+        self.hide()
+
+    @qtc.pyqtSlot()
+    def refresh(self):
+        counters = self._source()
+        if counters:
+            self.setText("\n".join(format_counters(c) for c in counters))
+        else:
+            self.setText("No media loaded")
+        self.adjustSize()
+        self.raise_()
+
+    def showEvent(self, event):
+        self.refresh()
+        self._timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
@@ -0,0 +1,96 @@
+from collections import defaultdict
+import time
+import weakref
+
+
+class PlayerMetrics:
+    """
+    Performance counters of one media player.
+    Writing a value is a dict update without locking, so the hot paths
+    of the players can record every frame. Each value is only written
+    by one thread, readers may see it slightly outdated.
+
+    Timings are exponential moving averages in milliseconds,
+    counters are monotonic totals and gauges hold the latest value.
+    """
+
+    SMOOTHING = 0.1  # weight of a new timing in the moving average
+    FPS_WINDOW = 1.0  # seconds over which the achieved framerate is measured
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.timings = {}
+        self.counters = defaultdict(int)
+        self.gauges = {}
+
+        self.fps = 0.0  # achieved framerate
+        self._window_start = time.perf_counter()
+        self._window_frames = 0
+
+    def add_time(self, key: str, seconds: float) -> None:
+        ms = seconds * 1000
+        last = self.timings.get(key)
+        self.timings[key] = ms if last is None else last + self.SMOOTHING * (ms - last)
+
+    def count(self, key: str, n: int = 1) -> None:
+        self.counters[key] += n
+
+    def set(self, key: str, value) -> None:
+        self.gauges[key] = value
+
+    def frame_shown(self) -> None:
+        """
+        Counts a displayed frame for the achieved framerate.
+        """
+        self._window_frames += 1
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        if elapsed >= self.FPS_WINDOW:
+            self.fps = self._window_frames / elapsed
+            self._window_start = now
+            self._window_frames = 0
+
+    def hit_rate(self) -> float:
+        """
+        Returns the share of frames served from a cache, NaN if none were requested.
+        """
+        hits = self.counters.get("cache_hits", 0)
+        misses = self.counters.get("cache_misses", 0)
+        return hits / (hits + misses) if hits + misses > 0 else float("nan")
+
+    def snapshot(self) -> dict:
+        """
+        Returns a copy of all values, timings get the suffix "_ms".
+        """
+        stale = time.perf_counter() - self._window_start > 2 * self.FPS_WINDOW
+        return {
+            "name": self.name,
+            "fps": 0.0 if stale else self.fps,  # no frames were shown recently
+            "cache_hit_rate": self.hit_rate(),
+            **{f"{key}_ms": value for key, value in dict(self.timings).items()},
+            **dict(self.counters),
+            **dict(self.gauges),
+        }
+
+    def reset(self) -> None:
+        self.timings.clear()
+        self.counters.clear()
+        self.gauges.clear()
+        self.fps = 0.0
+        self._window_start = time.perf_counter()
+        self._window_frames = 0
+
+
+__registry__ = weakref.WeakKeyDictionary()
+
+
+def metrics_of(owner) -> PlayerMetrics:
+    """
+    Returns the metrics of the given player, they are created on first access
+    and dropped together with the player.
+    """
+    metrics = __registry__.get(owner)
+    if metrics is None:
+        metrics = PlayerMetrics(type(owner).__name__)
+        __registry__[owner] = metrics
+    return metrics
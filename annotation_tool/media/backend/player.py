@@ -5,6 +5,8 @@ import PyQt6.QtCore as qtc
 import PyQt6.QtGui as qtg
 import PyQt6.QtWidgets as qtw
 
+from annotation_tool.media.backend.metrics import metrics_of
+from annotation_tool.media_reader import frame_index_at, frame_timestamp
 from annotation_tool.utility import filehandler
 
 
@@ -21,6 +23,8 @@ class AbstractMediaPlayer(qtw.QWidget):
     finished = qtc.pyqtSignal(qtw.QWidget)
     offset_changed = qtc.pyqtSignal(int)
 
+    LAG_SMOOTHING = 0.2  # weight of a new measurement in the moving average
+
     def __init__(self, is_main, *args, **kwargs):
         super(AbstractMediaPlayer, self).__init__(*args, **kwargs)
 
@@ -29,9 +33,16 @@ class AbstractMediaPlayer(qtw.QWidget):
         # media controll attributes
         self._fps = None
         self._N = None
+        self._timestamps = None  # only set for variable-frame-rate media
         self._position = 0
         self._offset = 0
         self._play_forward = True
+        self._replay_speed = 1
+        self._paused = True
+
+        # decode-to-display latency in ms, exponential moving average
+        self._lag = 0.0
+        self.metrics = metrics_of(self)
 
         self.setLayout(qtw.QHBoxLayout(self))
         self.layout().setContentsMargins(0, 0, 0, 0)
@@ -93,9 +104,19 @@ class AbstractMediaPlayer(qtw.QWidget):
     @qtc.pyqtSlot(int)
     def set_position(self, new_pos):
         if new_pos != self.position:
+            # the direction of the last step, e.g. backwards while scrubbing back
+            self._play_forward = new_pos > self.position
             self.position = new_pos
             self.update_media_position()
 
+    @qtc.pyqtSlot(float)
+    def set_replay_speed(self, x):
+        self._replay_speed = x
+
+    @qtc.pyqtSlot(bool)
+    def set_paused(self, paused):
+        self._paused = paused
+
     @qtc.pyqtSlot()
     def shutdown(self):
         self.terminated = True
@@ -118,6 +139,44 @@ class AbstractMediaPlayer(qtw.QWidget):
         assert 0 < x
         self._fps = x
 
+    @property
+    def timestamps(self):
+        return self._timestamps
+
+    @timestamps.setter
+    def timestamps(self, x):
+        assert qtc.QThread.currentThread() is self.thread()
+        self._timestamps = x
+
+    def timestamp_of(self, idx: int) -> float:
+        """
+        Returns the presentation time of the frame at the given index in milliseconds.
+        """
+        return frame_timestamp(idx, self.fps, self.timestamps)
+
+    def index_at(self, ms: float) -> int:
+        """
+        Returns the index of the frame that is shown at the given time in milliseconds.
+        """
+        return frame_index_at(ms, self.fps, self.timestamps)
+
+    @property
+    def lag(self) -> float:
+        """
+        Returns the smoothed time in milliseconds from requesting a position
+        until its frame is displayed.
+        """
+        return self._lag
+
+    def report_lag(self, ms: float) -> None:
+        self._lag += self.LAG_SMOOTHING * (ms - self._lag)
+
+    def performance_counters(self) -> dict:
+        """
+        Returns the performance counters of the player, see PlayerMetrics.
+        """
+        return self.metrics.snapshot()
+
     @property
     def position(self):
         return self._position
@@ -147,6 +206,18 @@ class AbstractMediaPlayer(qtw.QWidget):
         assert qtc.QThread.currentThread() is self.thread()
         self._offset = x
 
+    @property
+    def replay_speed(self):
+        return self._replay_speed
+
+    @property
+    def paused(self):
+        return self._paused
+
+    @property
+    def play_forward(self):
+        return self._play_forward
+
     @property
     def is_main_replay_widget(self):
         return self._is_main_replay_widget
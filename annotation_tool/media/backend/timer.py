@@ -1,10 +1,13 @@
+import math
 import time
 
 import PyQt6.QtCore as qtc
 
+from annotation_tool.settings import settings
+
 
 def time_in_millis():
-    return int(time.perf_counter() * 1000)
+    return time.perf_counter() * 1000  # monotonic, sub-millisecond resolution
 
 
 class Synchronizer(qtc.QObject):
@@ -23,11 +26,18 @@ class Synchronizer(qtc.QObject):
 
         self._replay_speed = 1
 
+        # when each subscriber was last sent a position during playback (ms)
+        self._last_sent = {}
+
         self._active = True
         self._paused = True
 
-        self._timer_interval = 5  # check every 5 ms for updates
+        # Instead of polling, the timer is armed for the next frame boundary
+        # of the reference widget. Deadlines are computed from the start time,
+        # so late timeouts do not accumulate drift.
         self._timer = qtc.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(qtc.Qt.TimerType.PreciseTimer)
         self._timer.timeout.connect(self.handle_timeout)
 
     @property
@@ -54,8 +64,9 @@ class Synchronizer(qtc.QObject):
                 delta_t = (
                     time_in_millis() - self._start_time
                 ) * self._replay_speed  # ms
-                delta_pos = int(delta_t * self.fps / 1000)  # frames
-                new_pos = self._start_pos + delta_pos
+                reference = self.reference_widget
+                start_t = reference.timestamp_of(self._start_pos)  # ms
+                new_pos = reference.index_at(start_t + delta_t)
                 return min(
                     new_pos, self.reference_widget.n_frames - 1
                 )  # do not go beyond the end
@@ -71,6 +82,31 @@ class Synchronizer(qtc.QObject):
         )
         if is_valid:
             self.update_positions(from_timeout=True)
+            self.schedule_next_frame()
+
+    def schedule_next_frame(self):
+        """
+        Arms the timer for the time the reference widget shows its next frame,
+        taking the replay speed into account. The positions of all subscribers
+        are derived from the reference, so they all advance on that tick.
+        """
+        reference = self.reference_widget
+        if reference is None or self._timer is None:
+            return
+        if self._paused or not self._active or self._start_time is None:
+            return
+
+        next_pos = self.frame_position + 1
+        if next_pos >= reference.n_frames:
+            return  # the end is reached, nothing changes anymore
+
+        # deadline relative to the start of the replay -> no drift
+        media_delta = reference.timestamp_of(next_pos) - reference.timestamp_of(
+            self._start_pos
+        )
+        deadline = self._start_time + media_delta / self._replay_speed
+        delay = max(0, math.ceil(deadline - time_in_millis()))
+        self._timer.start(delay)
 
     def update_positions(self, from_timeout=False, new_pos=None):
         is_valid = self.reference_widget is not None and self._active
@@ -80,31 +116,57 @@ class Synchronizer(qtc.QObject):
         if new_pos is None:
             new_pos = self.frame_position
 
-        assert 0 <= new_pos <= self.reference_widget.n_frames - 1  # sanity check
+        reference = self.reference_widget
+        assert 0 <= new_pos <= reference.n_frames - 1  # sanity check
+        new_t = reference.timestamp_of(new_pos)  # presentation time in ms
 
         for subscriber in self._subscribers:
-            target_pos = new_pos  # target position in the subscriber's fps
+            target_pos = new_pos  # target position in the subscriber's frames
+
+            same_timing = subscriber.fps == self.fps and (
+                subscriber.timestamps is None and reference.timestamps is None
+            )
+            if subscriber is not reference and not same_timing:
+                # map via the presentation time, handles variable framerates
+                target_pos = subscriber.index_at(new_t)
 
-            if subscriber.fps != self.fps:
-                target_pos *= (
-                    subscriber.fps / self.fps
-                )  # scale to the fps of the subscriber
-                target_pos = int(target_pos)
+            if from_timeout and not self._paused:
+                target_pos = self.__within_lag_budget__(subscriber, target_pos)
+                if target_pos is None:
+                    subscriber.dropped_positions += 1
+                    continue
 
             if target_pos != subscriber.position:
                 self.position_changed.emit(
                     subscriber, target_pos
                 )  # Update the displaying widgets
 
-            if (
-                subscriber.main_replay_widget
-                and from_timeout
-                and target_pos != self._last_timeout_pos
-            ):
-                self._last_timeout_pos = target_pos
-                self.timeout.emit(
-                    target_pos
-                )  # Update the rest of the app (e.g. the timeline)
+        if from_timeout and new_pos != self._last_timeout_pos:
+            self._last_timeout_pos = new_pos
+            self.timeout.emit(new_pos)  # Update the rest of the app (e.g. the timeline)
+
+    def __within_lag_budget__(self, subscriber, target_pos):
+        """
+        Adapts the position sent to a subscriber that displays its frames later
+        than the lag budget allows. Such a subscriber is sent the frame that is due
+        when it will be displayed, and no more positions than it can display,
+        the others are dropped.
+
+        Returns:
+            The position to send, None if the position is dropped.
+        """
+        now = time_in_millis()
+        lag = subscriber.lag
+        if lag <= settings.playback_lag_budget:
+            self._last_sent[subscriber] = now
+            return target_pos
+
+        if now - self._last_sent.get(subscriber, -math.inf) < lag:
+            return None  # the previous position is still being decoded
+
+        self._last_sent[subscriber] = now
+        due_t = subscriber.timestamp_of(target_pos) + lag * self._replay_speed
+        return min(subscriber.index_at(due_t), subscriber.n_frames - 1)
 
     @qtc.pyqtSlot(bool)
     def set_paused(self, paused):
@@ -116,6 +178,11 @@ class Synchronizer(qtc.QObject):
     @qtc.pyqtSlot()
     def pause(self):
         self._timer.stop()
+        if not self._paused and self._start_time is not None:
+            # positions may have been dropped, all subscribers show the final one
+            pos = self.frame_position
+            self._paused = True
+            self.update_positions(from_timeout=True, new_pos=pos)
         self._paused = True
         self._start_time = None
 
@@ -123,17 +190,19 @@ class Synchronizer(qtc.QObject):
     def unpause(self):
         self._paused = False
         self.sync_time()
-        self._timer.start(self._timer_interval)
+        self.schedule_next_frame()
 
     @qtc.pyqtSlot(float)
     def set_replay_speed(self, x):
         self._replay_speed = max(0.01, x)
         self.sync_time()
+        self.schedule_next_frame()
 
     @qtc.pyqtSlot(int)
     def set_position(self, x):
         self.sync_time(x)
         self.update_positions(from_timeout=False, new_pos=x)
+        self.schedule_next_frame()
 
     @qtc.pyqtSlot()
     def stop(self):
@@ -149,6 +218,7 @@ class Synchronizer(qtc.QObject):
         self._paused = True
         self._start_time = None
         self._subscribers = []
+        self._last_sent = {}
         self.timeout.emit(
             0
         )  # Overwrite outdated timeouts from previous replay, could be handled somewhere else
@@ -165,10 +235,12 @@ class Synchronizer(qtc.QObject):
 
         self.position_changed.connect(subscriber.set_position_)
         self.update_positions()
+        self.schedule_next_frame()
 
     @qtc.pyqtSlot(qtc.QObject)
     def unsubscribe(self, subscriber):
         self._subscribers = [x for x in self._subscribers if x != subscriber]
+        self._last_sent.pop(subscriber, None)
         self.position_changed.disconnect(subscriber.set_position_)
 
     def sync_time(self, new_pos: int = None):
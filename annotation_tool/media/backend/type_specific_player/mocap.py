@@ -1,18 +1,39 @@
+import hashlib
 import logging
+from pathlib import Path
+import time
+from typing import Optional
 
+import PyQt6.QtCore as qtc
 import PyQt6.QtWidgets as qtw
 import numpy as np
 import pyqtgraph.opengl as gl
 
 from annotation_tool.media.backend.player import AbstractMediaPlayer
 from annotation_tool.media_reader import media_reader as mr
+from annotation_tool.media_reader.mocap_readers import Skeleton
+from annotation_tool.media_reader.mocap_readers.sidecar import load_with_sidecar
 
 
 class MocapPlayer(AbstractMediaPlayer):
+    """
+    Renders the skeleton of mocap data as described by its reader (see Skeleton).
+    Positions may arrive far more often than the screen refreshes (e.g. 200 Hz mocap),
+    so rendering is scheduled at most once per display refresh and always shows
+    the latest position. Skipped positions are counted as coalesced (update requests
+    merged into one render) and dropped (frames that were never shown).
+    """
+
+    DEFAULT_REFRESH_RATE = 60  # Hz, if the screen does not report its refresh rate
+
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.setLayout(qtw.QHBoxLayout())
         self.media = None
+        self.skeleton = None  # how the frames are drawn
+        self.skeletons = (
+            None  # (n_frames, n_points, 3), None while the data is streamed
+        )
 
         self.graph = gl.GLViewWidget()
         # allow only mouse events
@@ -23,212 +44,213 @@ class MocapPlayer(AbstractMediaPlayer):
 
         self.graph.addItem(self.zgrid)
 
-        self.current_skeleton = gl.GLLinePlotItem(
-            pos=np.array([[0, 0, 0], [0, 0, 0]]),
-            color=np.array([[0, 0, 0, 0], [0, 0, 0, 0]]),
-            mode="lines",
-        )
-        self.graph.addItem(self.current_skeleton)
+        # persistent buffer, rendering only copies the new positions into it
+        self._vertices = None
+        self.current_skeleton = None  # created on load, depends on the skeleton
         self.layout().addWidget(self.graph)
 
+        # render scheduling
+        self._render_timer = qtc.QTimer(self)
+        self._render_timer.setSingleShot(True)
+        self._render_timer.setTimerType(qtc.Qt.TimerType.PreciseTimer)
+        self._render_timer.timeout.connect(self.render)
+        self._last_render_time = 0.0  # seconds
+        self._last_rendered_pos = None
+        self._requested_at = None  # when the pending render was requested
+
+        self.rendered_frames = 0
+        self.coalesced_frames = 0
+        self.dropped_frames = 0
+        self._coalesced_since_render = 0
+
     def get_skeleton(self, idx):
-        array = self.media[idx]
-        skeleton = _calculate_skeleton(array)
-        skeleton = _fix_skeleton_height(skeleton)
-        return skeleton
+        if self.skeletons is not None:
+            return self.skeletons[idx]
+        return _skeleton_tensor(self.media[idx][np.newaxis], self.skeleton)[0]
 
     def load(self, path):
-        self.media = mr(path, normalize=True)
+        self.metrics.name = Path(path).name
+        try:
+            self.media = mr(path, normalize=True)
+        except ValueError as e:
+            logging.error(str(e))
+            self.failed.emit(self)
+            return
+        self.skeleton = self.media.skeleton
+        if self.skeleton is None or not _fits(self.media, self.skeleton):
+            logging.error(f"The layout of the mocap data {path} is unknown.")
+            self.failed.emit(self)
+            return
+        self.skeletons = _load_skeletons(self.media, self.skeleton)
         self.n_frames = len(self.media)
         self.fps = self.media.fps
+
+        self._vertices = np.zeros((self.skeleton.n_points, 3), dtype=np.float32)
+        if self.skeleton.lines:
+            self.current_skeleton = gl.GLLinePlotItem(
+                pos=self._vertices, color=self.skeleton.colors, width=4, mode="lines"
+            )
+        else:
+            self.current_skeleton = gl.GLScatterPlotItem(
+                pos=self._vertices, color=self.skeleton.colors, size=8
+            )
+        self.graph.addItem(self.current_skeleton)
+
         self.update_media_position()
         self.loaded.emit(self)
 
     def update_media_position(self):
+        if self._render_timer.isActive():
+            self.coalesced_frames += 1  # the pending render shows the latest position
+            self._coalesced_since_render += 1
+            return
+
+        elapsed = time.perf_counter() - self._last_render_time
+        delay = max(0.0, 1 / self.refresh_rate() - elapsed)
+        self._requested_at = time.perf_counter()
+        self._render_timer.start(int(delay * 1000))
+
+    @qtc.pyqtSlot()
+    def render(self):
+        if self.media is None or self.current_skeleton is None:
+            return
         pos = self.position + self.offset
         pos_adjusted = max(0, min(pos, self.n_frames - 1))
-        if self.media is not None:
-            skeleton = self.get_skeleton(pos_adjusted)
-            self.current_skeleton.setData(
-                pos=skeleton, color=np.array(_skeleton_colors), width=4, mode="lines"
-            )
+
+        if not self.paused and self._last_rendered_pos is not None:
+            # frames passed during playback without being shown, jumps are not counted
+            skipped = abs(pos_adjusted - self._last_rendered_pos) - 1
+            self.dropped_frames += max(0, skipped)
+        self._last_rendered_pos = pos_adjusted
+
+        start = time.perf_counter()
+        skeleton = self.get_skeleton(pos_adjusted)
+        computed = time.perf_counter()
+        np.copyto(self._vertices, skeleton)
+        self.current_skeleton.setData(pos=self._vertices)  # float32, no copy
+
+        self._last_render_time = time.perf_counter()
+        self.__record_render__(start, computed)
+        self.rendered_frames += 1
+        if self._requested_at is not None:
+            self.report_lag((self._last_render_time - self._requested_at) * 1000)
+            self._requested_at = None
+
+    def __record_render__(self, start: float, computed: float) -> None:
+        # precomputed skeletons count as cache hits, streamed ones are computed
+        self.metrics.count(
+            "cache_hits" if self.skeletons is not None else "cache_misses"
+        )
+        self.metrics.add_time("decode", computed - start)
+        self.metrics.add_time("upload", self._last_render_time - computed)
+        self.metrics.set("queue_depth", self._coalesced_since_render)
+        self.metrics.frame_shown()
+        self._coalesced_since_render = 0
+
+    def refresh_rate(self) -> float:
+        screen = self.screen()
+        rate = screen.refreshRate() if screen is not None else 0
+        return rate if rate > 0 else self.DEFAULT_REFRESH_RATE
+
+    @property
+    def render_stats(self) -> dict:
+        return {
+            "rendered": self.rendered_frames,
+            "coalesced": self.coalesced_frames,
+            "dropped": self.dropped_frames,
+        }
+
+    def performance_counters(self) -> dict:
+        counters = super().performance_counters()
+        counters.update(
+            rendered_frames=self.rendered_frames,
+            coalesced_frames=self.coalesced_frames,
+            dropped_frames=self.dropped_frames,
+        )
+        return counters
 
     def shutdown(self):
+        self._render_timer.stop()
+        logging.debug(f"MocapPlayer render stats: {self.render_stats}")
         self.setFixedSize(0, 0)
         self.hide()
         self.media = None
+        self.skeletons = None
         self.terminated = True
         self.finished.emit(self)
         logging.debug("MocapPlayer shutdown")
 
 
-def _fix_skeleton_height(skeleton: np.ndarray) -> np.ndarray:
-    """
-    Centralize the skeleton to stay in the center of the coordinate system.
+_SKELETON_CHUNK = 65536  # frames converted at once
+_SKELETON_VERSION = 1  # increase when _skeleton_tensor computes different points
 
-    Args:
-        skeleton (np.ndarray): Skeleton to centralize.
 
-    Returns:
-        np.ndarray: Centralized skeleton.
-    """
-    segments = [
-        _body_segments_reversed[i] for i in ["L toe", "R toe", "L foot", "R foot"]
-    ]
-    height = min(skeleton[segment * 2, 2] for segment in segments)
-    skeleton[:, 2] -= height
-    return skeleton
-
-
-_body_segments = {
-    -1: "none",
-    0: "head",
-    1: "head end",
-    2: "L collar",
-    12: "R collar",
-    6: "L humerus",
-    16: "R humerus",
-    3: "L elbow",
-    13: "R elbow",
-    9: "L wrist",
-    19: "R wrist",
-    10: "L wrist end",
-    20: "R wrist end",
-    11: "lower back",
-    21: "root",
-    4: "L femur",
-    14: "R femur",
-    7: "L tibia",
-    17: "R tibia",
-    5: "L foot",
-    15: "R foot",
-    8: "L toe",
-    18: "R toe",
-}
-
-_body_segments_reversed = {v: k for k, v in _body_segments.items()}
-
-_colors = {"r": (1, 0, 0, 1), "g": (0, 1, 0, 1), "b": (0, 0, 1, 1), "y": (1, 1, 0, 1)}
-
-# each bodysegmentline needs 2 _colors because each has a start and end.
-# different _colors on each end result in a gradient
-_skeleton_colors = (
-    _colors["b"],
-    _colors["b"],  # head
-    _colors["b"],
-    _colors["b"],  # head end
-    _colors["b"],
-    _colors["b"],  # L collar
-    _colors["g"],
-    _colors["g"],  # L elbow
-    _colors["r"],
-    _colors["r"],  # L femur
-    _colors["r"],
-    _colors["r"],  # L foot
-    _colors["g"],
-    _colors["g"],  # L humerus
-    _colors["r"],
-    _colors["r"],  # L tibia
-    _colors["r"],
-    _colors["r"],  # L toe
-    _colors["g"],
-    _colors["g"],  # L wrist
-    _colors["g"],
-    _colors["g"],  # L wrist end
-    _colors["b"],
-    _colors["b"],  # lower back
-    _colors["b"],
-    _colors["b"],  # R collar
-    _colors["g"],
-    _colors["g"],  # R elbow
-    _colors["r"],
-    _colors["r"],  # R femur
-    _colors["r"],
-    _colors["r"],  # R foot
-    _colors["g"],
-    _colors["g"],  # R humerus
-    _colors["r"],
-    _colors["r"],  # R tibia
-    _colors["r"],
-    _colors["r"],  # R toe
-    _colors["g"],
-    _colors["g"],  # R wrist
-    _colors["g"],
-    _colors["g"],  # R wrist end
-    _colors["b"],
-    _colors["b"],  # root
-)
-
-
-def _calculate_skeleton(frame: np.array) -> np.array:
-    """Calculates the lines indicating positions of bodysegments at a single timestep
+def _skeleton_tensor(array: np.ndarray, skeleton: Skeleton) -> np.ndarray:
+    """Calculates the drawn points of the skeleton for all timesteps
 
     Arguments:
     ---------
-    frame_index : int
-        an integer between 0 and self.number_samples
-        denotes the frame/timestep at which the skeleton should be calculated
+    array : numpy.array
+        2D array with shape (t,n_columns), the mocap data.
+    skeleton : Skeleton
+        How the frames are drawn, see Skeleton.
     ---------
 
     Returns:
     ---------
     array : numpy.array
-        2D array with shape (44,3).
-        Contains 44 3-Tupels or 3D coordinates.
-        Each bodysegment gets 2 coordinates, for a start and  an end point.
-        There are 22 bodysegments.
+        3D float32 array with shape (t,n_points,3) with coordinates in meters.
+        The skeleton stands on the floor, i.e. its lowest floor point has height 0.
     ---------
 
     """
+    skeletons = array[:, skeleton.columns].astype(np.float32)  # a single gather
+    skeletons *= np.asarray(skeleton.scale, dtype=np.float32)
+    heights = skeletons[:, :, 2]
+    if skeleton.floor_points is not None:
+        heights = heights[:, skeleton.floor_points]
+    floor = np.fmin.reduce(heights, axis=1, keepdims=True)  # ignores invalid points
+    skeletons[:, :, 2] -= np.nan_to_num(floor)
+    return skeletons
+
+
+def _load_skeletons(media, skeleton: Skeleton) -> Optional[np.ndarray]:
+    """
+    Returns the skeletons of all frames, computed once and stored
+    as a sidecar next to the parsed mocap data.
+    Returns None for mocap data that is streamed, those skeletons
+    are computed per frame to keep the file from being parsed at once.
+    """
+    if media.streaming:
+        return None
+    variant = f"drawn_points_v{_SKELETON_VERSION}_{_skeleton_digest(skeleton)}"
+    return load_with_sidecar(
+        media.path, variant, lambda: _build_skeletons(media, skeleton)
+    )
+
+
+def _skeleton_digest(skeleton: Skeleton) -> str:
+    # the stored points are only valid for the skeleton they were computed with
+    m = hashlib.md5()
+    m.update(np.ascontiguousarray(skeleton.columns, dtype=np.int64).tobytes())
+    m.update(np.asarray(skeleton.scale, dtype=np.float64).tobytes())
+    if skeleton.floor_points is not None:
+        m.update(np.asarray(skeleton.floor_points, dtype=np.int64).tobytes())
+    m.update(str(skeleton.lines).encode())
+    return m.hexdigest()[:12]
+
+
+def _fits(media, skeleton: Skeleton) -> bool:
+    # the gather must not index beyond the columns of the frames
+    if len(media) == 0 or skeleton.n_points == 0:
+        return False
+    return skeleton.columns.max() < media[0].shape[-1]
+
 
-    # Extraction of Translational data for each bodysegment (source)
-    tx = []
-    ty = []
-    tz = []
-    for i in range(22):
-        tx.append(frame[i * 6 + 3])
-        ty.append(frame[i * 6 + 4])
-        tz.append(frame[i * 6 + 5])
-
-    # Extraction of Translational data for each bodysegment (target)
-    tu = []  # corresponds to x coordinates
-    tv = []  # corresponds to y coordinates
-    tw = []  # corresponds to z coordinates
-    offset = 3
-    for coords in [tu, tv, tw]:  # xyz        ->     uvw
-        coords.append(frame[2 * 6 + offset])  # 0   head      -> l collar/rcollar
-        coords.append(frame[0 * 6 + offset])  # 1   head end  -> head
-        coords.append(frame[11 * 6 + offset])  # 2 l collar    -> lowerback
-        coords.append(frame[6 * 6 + offset])  # 3 l elbow     -> l humerus
-        coords.append(frame[21 * 6 + offset])  # 4 l femur     -> root
-        coords.append(frame[7 * 6 + offset])  # 5 l foot      -> l tibia
-        coords.append(frame[2 * 6 + offset])  # 6 l humerus   -> l collar
-        coords.append(frame[4 * 6 + offset])  # 7 l tibia     -> l femur
-        coords.append(frame[5 * 6 + offset])  # 8 l toe       -> l foot
-        coords.append(frame[3 * 6 + offset])  # 9 l wrist     -> l elbow
-        coords.append(frame[9 * 6 + offset])  # 10 l wrist end -> l wrist
-        coords.append(frame[11 * 6 + offset])  # 11   lowerback -> lowerback
-        coords.append(frame[11 * 6 + offset])  # 12 r collar    -> lowerback
-        coords.append(frame[16 * 6 + offset])  # 13 r elbow     -> r humerus
-        coords.append(frame[21 * 6 + offset])  # 14 r femur     -> root
-        coords.append(frame[17 * 6 + offset])  # 15 r foot      -> r tibia
-        coords.append(frame[12 * 6 + offset])  # 16 r humerus   -> r collar
-        coords.append(frame[14 * 6 + offset])  # 17 r tibia     -> r femur
-        coords.append(frame[15 * 6 + offset])  # 18 r toe       -> r foot
-        coords.append(frame[13 * 6 + offset])  # 19 r wrist     -> r elbow
-        coords.append(frame[19 * 6 + offset])  # 20 r wrist end -> r wrist
-        coords.append(frame[11 * 6 + offset])  # 21   root      -> lowerback
-        offset += 1
-
-    # combine the 3 lists of source coordinates into a 3-tupel list
-    txyz = list(zip(tx, ty, tz))
-    # combine the 3 lists of target coordinates into a 3-tupel list
-    tuvw = list(zip(tu, tv, tw))
-    # append the coordinates from source and target alternatingly to a single list
-    t_all = []
-    for a, b in zip(txyz, tuvw):
-        t_all.append(a)
-        t_all.append(b)
-
-    # convert the list into an array, convert mm to meters and return the result
-    return np.array(t_all) / 1000
+def _build_skeletons(media, skeleton: Skeleton) -> np.ndarray:
+    # converted in chunks to bound the temporary memory
+    skeletons = np.empty((len(media), skeleton.n_points, 3), dtype=np.float32)
+    for lo in range(0, len(media), _SKELETON_CHUNK):
+        hi = min(lo + _SKELETON_CHUNK, len(media))
+        skeletons[lo:hi] = _skeleton_tensor(media.read_range(lo, hi), skeleton)
+    return skeletons
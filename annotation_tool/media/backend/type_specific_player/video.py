@@ -1,14 +1,21 @@
 import logging
+import math
 from pathlib import Path
-from threading import Thread
-from time import sleep
+from threading import Condition, Thread
+import time
+from typing import Optional, Tuple
 
 import PyQt6.QtCore as qtc
 import PyQt6.QtGui as qtg
 import PyQt6.QtWidgets as qtw
+import numpy as np
 
+from annotation_tool.media.backend.channel import CoalescingChannel
 from annotation_tool.media.backend.player import AbstractMediaPlayer
 from annotation_tool.media_reader import media_reader as mr
+from annotation_tool.media_reader import meta_data
+from annotation_tool.media_reader.decode_worker import DecodeWorker
+from annotation_tool.settings import settings
 
 
 def check_resize(vp):
@@ -23,7 +30,7 @@ def check_resize(vp):
         if w != vp.lblVid.width() or h != vp.lblVid.height():
             vp.get_update.emit()
             w, h = vp.lblVid.width(), vp.lblVid.height()
-        sleep(0.1)
+        time.sleep(0.1)
 
 
 class VideoPlayer(AbstractMediaPlayer):
@@ -45,6 +52,9 @@ class VideoPlayer(AbstractMediaPlayer):
         # design
         self.layout().setContentsMargins(0, 0, 0, 0)
 
+        # positions for the worker, stale ones are replaced by the latest
+        self.channel = CoalescingChannel()
+
         self.worker_thread = qtc.QThread()
         self.worker = VideoHelper(self)
         self.init_worker()
@@ -55,21 +65,28 @@ class VideoPlayer(AbstractMediaPlayer):
         self.resize_worker.start()
 
     def load(self, path):
+        self.metrics.name = Path(path).name
         self.load_worker.emit(path)
 
-    @qtc.pyqtSlot(float, int)
-    def worker_loaded(self, fps, n_frames):
+    @qtc.pyqtSlot(float, int, object)
+    def worker_loaded(self, fps, n_frames, timestamps):
         self.fps = fps
         self.n_frames = n_frames
+        self.timestamps = timestamps
         self.loaded.emit(self)
         self.adjustSize()
 
     def update_media_position(self):
-        self.get_update.emit()
+        self.channel.put(self.position + self.offset)
 
-    @qtc.pyqtSlot(qtg.QPixmap)
-    def update_pixmap(self, pix):
+    @qtc.pyqtSlot(qtg.QPixmap, object)
+    def update_pixmap(self, pix, requested_at):
+        start = time.perf_counter()
         self.lblVid.setPixmap(pix)
+        self.metrics.add_time("display", time.perf_counter() - start)
+        self.metrics.frame_shown()
+        if requested_at is not None:
+            self.report_lag((time.perf_counter() - requested_at) * 1000)
 
     def init_worker(self):
         self.worker.moveToThread(self.worker_thread)
@@ -77,6 +94,7 @@ class VideoPlayer(AbstractMediaPlayer):
         # connecting to worker
         self.load_worker.connect(self.worker.load)
         self.get_update.connect(self.worker.update)
+        self.channel.ready.connect(self.worker.update)
         self.worker.image_ready.connect(self.update_pixmap)
         self.worker.loaded.connect(self.worker_loaded)
         self.stop_worker.connect(self.worker.stop)
@@ -99,8 +117,10 @@ class VideoPlayer(AbstractMediaPlayer):
         self._active = False
         # disconnect relevant signals
         self.get_update.disconnect()  # dont forward updates to worker
+        self.channel.ready.disconnect()
         self.worker.image_ready.disconnect()  # dont update pixmap anymore
         self.lblVid.clear()  # clear pixmap
+        logging.debug(f"VideoPlayer performance: {self.performance_counters()}")
         self.stop_worker.emit()
 
     def kill(self):
@@ -124,28 +144,228 @@ class VideoPlayer(AbstractMediaPlayer):
                 logging.debug("VideoPlayer: Worker-Thread already terminated.")
             self.worker_thread = None
 
+    def performance_counters(self) -> dict:
+        counters = super().performance_counters()
+        counters["coalesced_frames"] = self.channel.coalesced
+        return counters
+
+
+class FramePrefetcher:
+    """
+    Decodes frames ahead of the displayed position into a bounded ring buffer.
+    The read-ahead follows the play direction and the stride at which positions
+    are requested, which grows with the replay speed.
+    The decoders are not thread-safe, so the prefetcher intentionally opens
+    a second decoder for the video (same file and backend as the given reader,
+    sharing its checksum and frame cache).
+    Optionally, the frames are decoded in a separate process instead.
+    Its frames are views into the worker's ring and stay pinned while they are
+    buffered or until the next frame has been handed out to the caller.
+    """
+
+    def __init__(self, media, max_size_mb: int = 64, use_process: bool = False):
+        meta = meta_data(media.path)
+        self.n_frames = meta["n_frames"]
+
+        frame_bytes = max(1, int(np.prod(meta["frame_shape"])))
+        self._capacity = max(4, min(32, max_size_mb * 2**20 // frame_bytes))
+        self._buffer = {}
+        self._shown = None  # frame handed out last, pinned until the next one
+
+        if use_process:
+            # at most capacity buffered + 1 shown + 1 in flight frames are pinned,
+            # the spare slots serve on-demand decodes
+            n_slots = self._capacity + 8
+            self.media = DecodeWorker(
+                media.path, meta["frame_shape"], n_slots, media.backend
+            )
+        else:
+            self.media = media.reopen()
+
+        self._condition = Condition()
+        self._active = True
+        self._position = None  # None -> nothing to read ahead (e.g. paused)
+        self._last_position = None
+        self._stride = 1
+        self._forward = True
+        self._max_size = None  # size (width, height) the frames have to fit into
+        self._proxy = False  # whether frames are read from the low resolution proxy
+
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def get(
+        self, idx: int, max_size: Tuple[int, int], proxy: bool
+    ) -> Optional[np.ndarray]:
+        with self._condition:
+            if max_size != self._max_size or proxy != self._proxy:
+                return None
+            frame = self._buffer.pop(idx, None)
+            if frame is not None:
+                self.__hand_out__(frame)
+            return frame
+
+    def decode(self, idx: int, max_size: Tuple[int, int], proxy: bool) -> np.ndarray:
+        """
+        Decodes a frame that was not prefetched in the decode process.
+        Like frames from get, it stays valid until the next frame is handed out.
+
+        Raises:
+            RuntimeError: If there is no decode process or it failed.
+        """
+        if self.worker is None:
+            raise RuntimeError("FramePrefetcher: no decode process.")
+        frame = self.worker.get_scaled_frame(idx, max_size, proxy, pin=True)
+        with self._condition:
+            self.__hand_out__(frame)
+        return frame
+
+    def update(
+        self,
+        position: int,
+        forward: bool,
+        speed: float,
+        paused: bool,
+        max_size: Tuple[int, int],
+        proxy: bool,
+    ):
+        with self._condition:
+            if max_size != self._max_size or proxy != self._proxy:
+                self._max_size = max_size
+                self._proxy = proxy
+                self.__release__(*self._buffer.values())
+                self._buffer.clear()
+
+            delta = 0 if self._last_position is None else position - self._last_position
+            if delta != 0 and (delta > 0) == forward:
+                self._stride = max(1, min(abs(delta), math.ceil(speed)))
+            self._last_position = position
+            self._forward = forward
+
+            self._position = None if paused else position
+            targets = set(self._targets())
+            self.__release__(*(f for i, f in self._buffer.items() if i not in targets))
+            self._buffer = {i: f for i, f in self._buffer.items() if i in targets}
+            self._condition.notify()
+
+    @property
+    def worker(self) -> Optional[DecodeWorker]:
+        """
+        Returns the decode process, None if the frames are decoded in this process.
+        """
+        return self.media if isinstance(self.media, DecodeWorker) else None
+
+    @property
+    def buffered(self) -> int:
+        """
+        Returns the number of frames that are decoded ahead.
+        """
+        return len(self._buffer)
+
+    def stop(self):
+        with self._condition:
+            self._active = False
+            self._buffer.clear()
+            self._shown = None
+            self._condition.notify()
+        if isinstance(self.media, DecodeWorker):
+            self._thread.join(timeout=1)
+            self.media.stop()
+
+    def __hand_out__(self, frame: np.ndarray):
+        # expects the condition to be held
+        if self._shown is not None:
+            self.__release__(self._shown)
+        self._shown = frame
+
+    def __release__(self, *frames: np.ndarray):
+        worker = self.worker
+        if worker is not None:
+            for frame in frames:
+                worker.release(frame)
+
+    def _targets(self):
+        if self._position is None:
+            return []
+        step = self._stride if self._forward else -self._stride
+        targets = (self._position + k * step for k in range(1, self._capacity + 1))
+        return [t for t in targets if 0 <= t < self.n_frames]
+
+    def _next_target(self) -> Optional[int]:
+        for target in self._targets():
+            if target not in self._buffer:
+                return target
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                target = self._next_target()
+                while self._active and target is None:
+                    self._condition.wait()
+                    target = self._next_target()
+                if not self._active:
+                    return
+                max_size, proxy = self._max_size, self._proxy
+
+            # decode outside the lock
+            try:
+                if self.worker is not None:
+                    frame = self.worker.get_scaled_frame(
+                        target, max_size, proxy, pin=True
+                    )
+                else:
+                    frame = self.media.get_scaled_frame(target, max_size, proxy)
+            except RuntimeError as e:
+                logging.error(f"FramePrefetcher: {e}")
+                return
+
+            with self._condition:
+                quality_changed = max_size != self._max_size or proxy != self._proxy
+                if not quality_changed and target in self._targets():
+                    self._buffer[target] = frame
+                else:
+                    self.__release__(frame)
+
 
 class VideoHelper(qtc.QObject):
-    image_ready = qtc.pyqtSignal(qtg.QPixmap)
-    loaded = qtc.pyqtSignal(float, int)
+    image_ready = qtc.pyqtSignal(qtg.QPixmap, object)  # pixmap, request time
+    loaded = qtc.pyqtSignal(float, int, object)
     finished = qtc.pyqtSignal()
 
+    FAST_REPLAY_SPEED = 1.5  # replay speeds above this read from the proxy
+    SCRUB_INTERVAL = 0.2  # seconds between position jumps that count as scrubbing
+    REFINE_DELAY = 250  # ms until a proxy frame is replaced by the original
+
     def __init__(self, video_player: VideoPlayer):
         super().__init__()
         self._video_player = video_player
+        self.metrics = video_player.metrics
         self.media = None
+        self.prefetcher = None
 
-        self._last_img = None
         self._finished = False
 
         self._last_pos = -9999999
         self._last_w = -1
         self._last_h = -1
+        self._last_update_time = 0
+        self._showing_proxy = False
+
+        # swaps the proxy frame for the original once scrubbing has stopped
+        self._refine_timer = qtc.QTimer(self)
+        self._refine_timer.setSingleShot(True)
+        self._refine_timer.setInterval(self.REFINE_DELAY)
+        self._refine_timer.timeout.connect(self.refine)
 
     @qtc.pyqtSlot(Path)
     def load(self, path: Path):
         self.media = mr(path)
-        self.loaded.emit(self.fps, self.n_frames)
+        self.media.has_proxy()  # start building the proxy early
+        self.prefetcher = FramePrefetcher(
+            self.media, use_process=settings.video_decode_process
+        )
+        self.loaded.emit(self.fps, self.n_frames, self.media.timestamps)
 
     @property
     def n_frames(self):
@@ -168,8 +388,18 @@ class VideoHelper(qtc.QObject):
             return
         self.__update__()
 
-    def __update__(self):
-        pos = self._video_player.position + self._video_player.offset
+    @qtc.pyqtSlot()
+    def refine(self):
+        if self._finished or not self._showing_proxy:
+            return
+        self._last_pos = -9999999  # force redrawing the current position
+        self.__update__(allow_proxy=False)
+
+    def __update__(self, allow_proxy=True):
+        # only the latest requested position is decoded, older ones are dropped
+        pos, requested_at = self._video_player.channel.take()
+        if pos is None:
+            pos = self._video_player.position + self._video_player.offset
         width, height = (
             self._video_player.lblVid.width(),
             self._video_player.lblVid.height(),
@@ -184,31 +414,55 @@ class VideoHelper(qtc.QObject):
             # no update needed
             return
 
+        # Scrubbing (fast position jumps while paused) and fast replay
+        # read from the low resolution proxy, if there is one.
+        paused = self._video_player.paused
+        now = time.perf_counter()
+        fast_replay = (
+            not paused and self._video_player.replay_speed > self.FAST_REPLAY_SPEED
+        )
+        scrubbing = (
+            paused
+            and abs(pos - self._last_pos) > 1
+            and now - self._last_update_time < self.SCRUB_INTERVAL
+        )
+        proxy = allow_proxy and (fast_replay or scrubbing) and self.media.has_proxy()
+
+        if not paused and pos_changed and self._last_pos >= 0:
+            # positions passed during playback without being shown
+            self.metrics.count("dropped_frames", max(0, abs(pos - self._last_pos) - 1))
+
         self._last_pos = pos
         self._last_w = width
         self._last_h = height
+        self._last_update_time = now
+
+        # The frame is decoded at the size of the label already,
+        # only frames smaller than the label get scaled up by Qt.
+        frame = self.prefetcher.get(pos, (width, height), proxy)
+        self.prefetcher.update(
+            pos,
+            self._video_player.play_forward,
+            self._video_player.replay_speed,
+            paused,
+            (width, height),
+            proxy,
+        )
+        self.metrics.set("queue_depth", self.prefetcher.buffered)
+        if frame is None:
+            self.metrics.count("cache_misses")
+            start = time.perf_counter()
+            frame = self.__decode__(pos, (width, height), proxy)
+            self.metrics.add_time("decode", time.perf_counter() - start)
+        else:
+            self.metrics.count("cache_hits")
+
+        self._showing_proxy = proxy
+        if proxy:
+            self._refine_timer.start()
 
-        if not pos_changed:
-            # only dims changed
-            img = self._last_img
-            img = img.scaled(
-                width,
-                height,
-                qtc.Qt.AspectRatioMode.KeepAspectRatio,
-                qtc.Qt.TransformationMode.SmoothTransformation,
-            )
-            pix = qtg.QPixmap.fromImage(img)
-
-            try:
-                self.image_ready.emit(pix)
-            except RuntimeError:
-                # widget already deleted
-                pass
-            return
-
-        # full update
-        frame = self.media[pos]  # Loading image and pixmap
         if frame is not None:
+            start = time.perf_counter()
 
             h, w, ch = frame.shape
             bytes_per_line = ch * w
@@ -217,24 +471,44 @@ class VideoHelper(qtc.QObject):
                 frame, w, h, bytes_per_line, qtg.QImage.Format.Format_RGB888
             )
 
-            self._last_img = img  # keep a reference to the image
-
-            img = img.scaled(
-                width,
-                height,
-                qtc.Qt.AspectRatioMode.KeepAspectRatio,
-                qtc.Qt.TransformationMode.SmoothTransformation,
-            )
+            if w < width and h < height:
+                img = img.scaled(
+                    width,
+                    height,
+                    qtc.Qt.AspectRatioMode.KeepAspectRatio,
+                    qtc.Qt.TransformationMode.SmoothTransformation,
+                )
+            converted = time.perf_counter()
             pix = qtg.QPixmap.fromImage(img)
+            self.metrics.add_time("convert", converted - start)
+            self.metrics.add_time("upload", time.perf_counter() - converted)
 
             try:
-                self.image_ready.emit(pix)
+                self.image_ready.emit(pix, requested_at)
             except RuntimeError:
                 pass  # widget already deleted
 
+    def __decode__(
+        self, pos: int, max_size: Tuple[int, int], proxy: bool
+    ) -> np.ndarray:
+        # With a decode process, frames that were not prefetched are decoded there
+        # as well, so this process never blocks on the decoder. The request waits
+        # for at most one prefetch in flight. The frame is a view into the worker's
+        # ring, pinned until the next frame is shown.
+        worker = self.prefetcher.worker
+        if worker is not None and worker.is_alive():
+            try:
+                return self.prefetcher.decode(pos, max_size, proxy)
+            except RuntimeError as e:
+                logging.warning(f"VideoHelper: {e}, decoding in process.")
+        return self.media.get_scaled_frame(pos, max_size, proxy)
+
     @qtc.pyqtSlot()
     def stop(self):
         self._finished = True
+        self._refine_timer.stop()
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
         # self._video_player = None
         self.finished.emit()
         logging.info("VideoHelper: finished")
@@ -244,3 +518,5 @@ class VideoHelper(qtc.QObject):
 
     def kill(self):
         self._finished = True
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
@@ -32,6 +32,8 @@ class QMediaWidget(qtw.QWidget):
             Pauses the media
         set_replay_speed
             Updates how fast the media is played
+        set_hud_visible
+            Shows or hides the playback performance overlay
         shutdown
             Cleans up all threads and subwidgets
     """
@@ -77,6 +79,10 @@ class QMediaWidget(qtw.QWidget):
     def set_replay_speed(self, x):
         self.controller.set_replay_speed(x)
 
+    @qtc.pyqtSlot(bool)
+    def set_hud_visible(self, visible):
+        self.controller.set_hud_visible(visible)
+
     @qtc.pyqtSlot()
     def shutdown(self):
         self.controller.shutdown()
@@ -1,4 +1,6 @@
 from .base import MediaReader  # noqa F401
+from .base import frame_index_at  # noqa F401
+from .base import frame_timestamp  # noqa F401
 from .base import media_reader  # noqa F401
 from .base import media_type_of  # noqa F401
 from .base import meta_data  # noqa F401
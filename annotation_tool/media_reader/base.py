@@ -3,11 +3,188 @@ import functools
 import logging
 import os
 from pathlib import Path
+import threading
 import time
-from typing import Optional, Tuple
+from typing import Any, Callable, Iterable, Optional, Tuple
 
 import numpy as np
 
+from annotation_tool.file_cache import application_subdir
+from annotation_tool.utility.filehandler import JsonStore
+
+
+def sorted_unique_indices(
+    indices: Iterable[int], n_frames: int
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Sorts and dedupes the given frame indices for batched reading.
+
+    Args:
+        indices: The requested frame indices (in any order, duplicates allowed).
+        n_frames: The number of frames in the media, used for bounds checking.
+
+    Returns:
+        A tuple (unique, inverse). unique contains the sorted, deduplicated indices.
+        inverse maps the unique frames back to the requested order, i.e. unique[inverse]
+        equals the requested indices. inverse is None if the requested indices
+        were already sorted and free of duplicates.
+
+    Raises:
+        IndexError: If any index is out of range.
+    """
+    requested = np.asarray(list(indices), dtype=np.int64).reshape(-1)
+    if requested.size == 0:
+        return requested, None
+    if requested.min() < 0 or requested.max() >= n_frames:
+        raise IndexError("Index out of range.")
+
+    if requested.size == 1 or np.all(requested[1:] > requested[:-1]):
+        return requested, None
+
+    unique, inverse = np.unique(requested, return_inverse=True)
+    return unique, inverse
+
+
+def read_frames(
+    get_frame: Callable[[int], np.ndarray], indices: Iterable[int], n_frames: int
+) -> np.ndarray:
+    """
+    Reads the frames at the given indices one by one into a preallocated array.
+    This is the default batched read of all readers, each frame is read only once
+    and in sorted order.
+
+    Args:
+        get_frame: A function that returns the frame at an index.
+        indices: The requested frame indices (in any order, duplicates allowed).
+        n_frames: The number of frames in the media, used for bounds checking.
+
+    Returns:
+        An array of shape (n, *frame_shape) holding the frames in the requested order.
+        Empty batches keep the frame shape and dtype, if there are any frames.
+
+    Raises:
+        IndexError: If any index is out of range.
+    """
+    unique, inverse = sorted_unique_indices(indices, n_frames)
+    if unique.size == 0:
+        if n_frames == 0:
+            return np.empty((0,))
+        first = get_frame(0)
+        return np.empty((0,) + first.shape, dtype=first.dtype)
+
+    first = get_frame(int(unique[0]))
+    frames = np.empty((unique.size,) + first.shape, dtype=first.dtype)
+    frames[0] = first
+    for i, idx in enumerate(unique[1:], start=1):
+        frames[i] = get_frame(int(idx))
+
+    return frames if inverse is None else frames[inverse]
+
+
+def file_identifier(path: Path) -> Tuple[int, int]:
+    """
+    Returns an identifier for the current version of the file.
+
+    Args:
+        path: The path to the file.
+
+    Returns:
+        The tuple (mtime_ns, size). Changes whenever the file is modified.
+
+    Raises:
+        OSError: If the file cannot be accessed.
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class __ProbeCache:
+    """
+    Memoizes the results of probe functions by (probe function, path, mtime, size).
+    """
+
+    def __init__(self):
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def probe(self, probe_function: Callable[[Path], Any], path: Path) -> Any:
+        try:
+            key = (probe_function, str(path), file_identifier(path))
+        except OSError:
+            return probe_function(path)  # let the probe handle missing files
+
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+        result = probe_function(path)
+        with self._lock:
+            self._results[key] = result
+        return result
+
+
+__probe_cache__ = __ProbeCache()
+
+
+def probe(probe_function: Callable[[Path], Any], path: Path) -> Any:
+    """
+    Runs a cheap, header-only probe on the given file.
+    The result is memoized until the file changes, so probing the same file
+    over and over again does not touch the disk.
+
+    Args:
+        probe_function: A function that takes a path and returns the probe result.
+        path: The path to the media file.
+
+    Returns:
+        The (memoized) result of the probe function.
+    """
+    return __probe_cache__.probe(probe_function, path)
+
+
+def frame_timestamp(
+    idx: int, fps: float, timestamps: Optional[np.ndarray] = None
+) -> float:
+    """
+    Returns the presentation time of the frame at the given index.
+    Indices beyond the last frame are extrapolated with the framerate.
+
+    Args:
+        idx: The index of the frame.
+        fps: The (nominal) framerate of the media.
+        timestamps: The timestamps of all frames for variable-frame-rate media.
+
+    Returns:
+        The presentation time in milliseconds.
+    """
+    if timestamps is None or timestamps.size == 0:
+        return idx * 1000 / fps
+    if idx < timestamps.size:
+        return float(timestamps[max(0, idx)])
+    return float(timestamps[-1]) + (idx - timestamps.size + 1) * 1000 / fps
+
+
+def frame_index_at(
+    ms: float, fps: float, timestamps: Optional[np.ndarray] = None
+) -> int:
+    """
+    Returns the index of the frame that is shown at the given time,
+    i.e. the last frame presented at or before it (binary search for
+    variable-frame-rate media). Times beyond the last frame are extrapolated.
+
+    Args:
+        ms: The time in milliseconds.
+        fps: The (nominal) framerate of the media.
+        timestamps: The timestamps of all frames for variable-frame-rate media.
+
+    Returns:
+        The (non-negative) index of the frame.
+    """
+    if timestamps is None or timestamps.size == 0:
+        return max(0, int(ms * fps / 1000 + 1e-6))  # tolerate rounding errors
+    if ms <= timestamps[-1]:
+        return max(0, int(np.searchsorted(timestamps, ms, side="right")) - 1)
+    return timestamps.size - 1 + int((ms - timestamps[-1]) * fps / 1000 + 1e-6)
+
 
 class MediaReader(abc.ABC):
     """
@@ -40,6 +217,32 @@ class MediaReader(abc.ABC):
     def fps(self) -> float:
         return self.__get_fps__()
 
+    @property
+    def timestamps(self) -> Optional[np.ndarray]:
+        """
+        Returns the presentation times of all frames in milliseconds
+        or None if the media has a constant framerate.
+        """
+        return self.__get_timestamps__()
+
+    def timestamp_of(self, idx: int) -> float:
+        """
+        Returns the presentation time of the frame at the given index in milliseconds.
+
+        Raises:
+            IndexError: If the index is out of range.
+        """
+        if idx < 0 or idx >= len(self):
+            raise IndexError("Index out of range.")
+        return frame_timestamp(idx, self.fps, self.timestamps)
+
+    def index_at(self, ms: float) -> int:
+        """
+        Returns the index of the frame that is shown at the given time in milliseconds.
+        The index is clamped to the range of the media.
+        """
+        return min(frame_index_at(ms, self.fps, self.timestamps), len(self) - 1)
+
     @property
     def path(self) -> Path:
         return self.__get_path__()
@@ -68,7 +271,7 @@ class MediaReader(abc.ABC):
 
         if isinstance(idx, slice):
             return (self[i] for i in range(*idx.indices(len(self))))
-        elif isinstance(list, tuple):
+        elif isinstance(idx, (list, tuple)):
             return (self[i] for i in idx)
         elif isinstance(idx, int):
             if idx >= len(self):
@@ -92,6 +295,19 @@ class MediaReader(abc.ABC):
         """
         raise NotImplementedError
 
+    def __get_batch__(self, indices: Iterable[int]) -> np.ndarray:
+        """
+        Returns the frames at the given indices stacked into one array.
+        Subclasses should override this if the underlying reader supports
+        faster batched access than reading the frames one by one.
+
+        Args:
+            indices: The indices of the frames to return.
+        Returns:
+            An array of shape (n, *frame_shape) holding the requested frames in the requested order.
+        """
+        return read_frames(self.__get_frame__, indices, len(self))
+
     @abc.abstractmethod
     def __get_frame_count__(self) -> int:
         """
@@ -112,6 +328,16 @@ class MediaReader(abc.ABC):
         """
         raise NotImplementedError
 
+    def __get_timestamps__(self) -> Optional[np.ndarray]:
+        """
+        Returns the presentation times of all frames of variable-frame-rate media.
+        Subclasses should override this if the media can have a variable framerate.
+
+        Returns:
+            The timestamps in milliseconds or None if the framerate is constant.
+        """
+        return None
+
     @abc.abstractmethod
     def __get_path__(self) -> Path:
         """
@@ -122,6 +348,34 @@ class MediaReader(abc.ABC):
         """
         raise NotImplementedError
 
+    def get_batch(self, indices: Iterable[int]) -> np.ndarray:
+        """
+        Returns the frames at the given indices as one preallocated array.
+        The indices are sorted and deduplicated internally, so each needed frame is
+        decoded only once and consecutive runs are read sequentially.
+
+        Args:
+            indices: The indices of the frames to return (any order, duplicates allowed).
+        Returns:
+            An array of shape (n, *frame_shape) with the frames in the requested order.
+        Raises:
+            IndexError: If any index is out of range.
+        """
+        return self.__get_batch__(indices)
+
+    def read_range(self, lo: int, hi: int, step: int = 1) -> np.ndarray:
+        """
+        Returns the frames between lo (inclusive) and hi (exclusive).
+
+        Args:
+            lo: The lower bound of the frame indices.
+            hi: The upper bound of the frame indices.
+            step: The step size between frames.
+        Returns:
+            An array of shape (n, *frame_shape) with the frames between lo and hi.
+        """
+        return self.get_batch(range(lo, hi, step))
+
     def numpy(self, lo: int, hi: int, step: int = 1):
         """
         Returns a numpy array of the frames between lo and hi.
@@ -133,7 +387,7 @@ class MediaReader(abc.ABC):
         Returns:
             A numpy array of the frames between lo and hi with step size step.
         """
-        return np.array([self[i] for i in range(lo, hi, step)])
+        return self.read_range(lo, hi, step)
 
 
 class __MediaSelector:
@@ -170,7 +424,7 @@ class __MediaSelector:
             ValueError: If the media type could not be determined.
         """
         for media_type, selector_function in self._selector_functions.items():
-            if selector_function(path):
+            if probe(selector_function, path):
                 return media_type
         return None
 
@@ -279,18 +533,49 @@ def media_type_of(path: Path) -> str:
     return __media_selector__.select(path)
 
 
+class __MetaDataIndex:
+    """
+    Persistent index of the metadata of media files.
+    Entries are stored per path and are only valid for the (mtime, size)
+    identifier they were created with. New entries are written in batches,
+    so opening a folder of files does not rewrite the index for every file.
+    """
+
+    def __init__(self):
+        self._store = JsonStore(
+            lambda: Path(application_subdir("media"), "meta_data.json")
+        )
+
+    def get(self, file: Path, identifier: Tuple) -> Optional[dict]:
+        entry = self._store.get(str(file))
+        if entry is not None and tuple(entry["identifier"]) == identifier:
+            return entry["meta_data"]
+        return None
+
+    def put(self, file: Path, identifier: Tuple, meta: dict) -> None:
+        self._store.put(str(file), {"identifier": identifier, "meta_data": meta})
+
+
+__meta_data_index__ = __MetaDataIndex()
+
+
 @functools.lru_cache(maxsize=None)
 def _meta_data(file: Path, identifier: Tuple) -> dict:
     """
     The identifier-arg is only used for caching.
     """
-    mr = media_reader(file)
-    return {
-        "fps": mr.fps,
-        "n_frames": len(mr),
-        "duration": mr.duration,
-        "media_type": mr.media_type,
-    }
+    meta = __meta_data_index__.get(file, identifier)
+    if meta is None:
+        mr = media_reader(file)
+        meta = {
+            "fps": mr.fps,
+            "n_frames": len(mr),
+            "duration": mr.duration,
+            "media_type": mr.media_type,
+            "frame_shape": list(mr[0].shape),
+        }
+        __meta_data_index__.put(file, identifier, meta)
+    return {**meta, "frame_shape": tuple(meta["frame_shape"])}
 
 
 def meta_data(file: Path) -> dict:
@@ -300,8 +585,11 @@ def meta_data(file: Path) -> dict:
         - n_frames: (int) The number of frames in the media.
         - duration: (int) The duration of the media in milliseconds.
         - media_type: (str) The type of the media (e.g. video, mocap, etc.).
+        - frame_shape: (tuple) The shape of a single frame, e.g. (h, w, c) for videos.
 
-    The values are cached, so this function can be called multiple times without performance loss.
+    The values are cached in memory and on disk, so this function can be called multiple
+    times (and across sessions) without performance loss. The cached values are invalidated
+    as soon as the modification time or the size of the file changes.
     This is the preferred way to get information about the media file.
     Use this if you don't need the actual media data.
 
@@ -312,9 +600,6 @@ def meta_data(file: Path) -> dict:
         dict: The metadata. If the file does not exist, an empty dictionary is returned.
     """
     try:
-        last_change = int(os.path.getmtime(file))
-        size = os.path.getsize(file)
-        identifier = (last_change, size)
-        return _meta_data(file, identifier)
+        return _meta_data(file, file_identifier(file))
     except FileNotFoundError:
         return {}
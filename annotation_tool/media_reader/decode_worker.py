@@ -0,0 +1,189 @@
+import logging
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from pathlib import Path
+import queue
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .video_readers import get_video_backend
+
+RESPONSE_TIMEOUT = 10  # seconds until a decode request is considered lost
+
+
+def __decode_loop__(
+    path: Path, backend: str, shm_name: str, slot_bytes: int, requests, responses
+):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        from annotation_tool.media_reader import media_reader
+        from annotation_tool.media_reader.video_readers import set_video_backend
+
+        set_video_backend(backend)  # the spawned process starts with the defaults
+        media = media_reader(path)
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            seq, slot, idx, max_size, proxy = request
+            try:
+                frame = media.get_scaled_frame(idx, max_size, proxy)
+                buffer = np.ndarray(
+                    frame.shape, np.uint8, buffer=shm.buf, offset=slot * slot_bytes
+                )
+                buffer[:] = frame
+                responses.put((seq, frame.shape))
+            except Exception as e:
+                responses.put((seq, repr(e)))
+    finally:
+        shm.close()
+
+
+class DecodeWorker(object):
+    """
+    Decodes the frames of a single video in a separate process.
+    The worker writes RGB frames into a ring of slots in shared memory,
+    the returned frames are read-only views into that ring (no copies).
+    A frame stays valid until n_slots further frames have been requested,
+    consumers must copy frames they want to keep longer or pin them:
+    the slot of a pinned frame is not reused until the frame is released.
+    Every request carries a sequence number, so a response that arrives
+    after its request timed out is never taken for a later request.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        frame_shape: Tuple[int, ...],
+        n_slots: int,
+        backend: Optional[str] = None,
+    ):
+        """
+        Args:
+            path (Path): The path to the video.
+            frame_shape (Tuple[int, ...]): The shape of the full resolution frames,
+                every slot is large enough to hold one of them.
+            n_slots (int): The number of slots in the ring.
+            backend (Optional[str]): The video backend the worker decodes with.
+                Defaults to the preferred backend.
+        """
+        self.path = path
+        self.n_slots = n_slots
+        self._slot_bytes = int(np.prod(frame_shape))
+        self._next_slot = 0
+        self._pinned = set()  # slots whose frames are still in use
+        self._seq = 0  # sequence number of the last request
+        self._lock = threading.Lock()
+        self._stopped = False
+
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=n_slots * self._slot_bytes
+        )
+        self._address = np.ndarray(
+            (n_slots * self._slot_bytes,), np.uint8, buffer=self._shm.buf
+        ).ctypes.data  # start of the ring, to find the slot of a frame
+
+        ctx = mp.get_context("spawn")  # forking the GUI process is not safe
+        self._requests = ctx.Queue()
+        self._responses = ctx.Queue()
+        self._process = ctx.Process(
+            target=__decode_loop__,
+            args=(
+                path,
+                backend if backend is not None else get_video_backend(),
+                self._shm.name,
+                self._slot_bytes,
+                self._requests,
+                self._responses,
+            ),
+            daemon=True,
+        )
+        self._process.start()
+        logging.info(f"Started decode worker (pid={self._process.pid}) for {path}.")
+
+    def get_scaled_frame(
+        self, idx: int, max_size: Tuple[int, int], proxy: bool = False, pin=False
+    ) -> np.ndarray:
+        """
+        Returns the frame at the given index, decoded at the size
+        it is displayed at, see VideoReader.get_scaled_frame.
+
+        Args:
+            pin (bool): Whether to keep the slot of the frame until it is released.
+
+        Raises:
+            RuntimeError: If the worker failed to decode the frame.
+        """
+        with self._lock:
+            slot = self.__free_slot__()
+            self._seq += 1
+            seq = self._seq
+            self._requests.put((seq, slot, idx, max_size, proxy))
+            deadline = time.monotonic() + RESPONSE_TIMEOUT
+            while True:
+                try:
+                    _seq, result = self._responses.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    raise RuntimeError(
+                        f"Decode worker for {self.path} did not respond."
+                    )
+                if _seq == seq:
+                    break  # older responses belong to requests that timed out
+
+            if isinstance(result, str):
+                raise RuntimeError(
+                    f"Decoding frame {idx} of {self.path} failed: {result}"
+                )
+            if pin:
+                self._pinned.add(slot)
+
+        frame = np.ndarray(
+            result, np.uint8, buffer=self._shm.buf, offset=slot * self._slot_bytes
+        )
+        frame.flags.writeable = False
+        return frame
+
+    def release(self, frame: np.ndarray) -> None:
+        """
+        Releases the slot of a pinned frame, the frame must not be used afterwards.
+        """
+        slot = (frame.ctypes.data - self._address) // self._slot_bytes
+        with self._lock:
+            self._pinned.discard(slot)
+
+    def __free_slot__(self) -> int:
+        # the next slot in the ring that is not pinned, expects the lock to be held
+        for _ in range(self.n_slots):
+            slot = self._next_slot
+            self._next_slot = (slot + 1) % self.n_slots
+            if slot not in self._pinned:
+                return slot
+        raise RuntimeError(
+            f"All slots of the decode worker for {self.path} are pinned."
+        )
+
+    def is_alive(self) -> bool:
+        return self._process.is_alive()
+
+    def stop(self):
+        """
+        Stops the worker process and releases the shared memory.
+        Stopping a stopped worker does nothing.
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+        self._requests.put(None)
+        self._process.join(timeout=1)
+        if self._process.is_alive():
+            self._process.terminate()
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # frames are still referenced, the mapping is released with them
+        self._shm.unlink()
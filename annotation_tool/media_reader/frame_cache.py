@@ -0,0 +1,118 @@
+from collections import OrderedDict
+import logging
+import math
+import threading
+from typing import Hashable, Optional
+
+import numpy as np
+
+
+class FrameCache(object):
+    """
+    LRU cache for decoded frames, bounded by the number of bytes it holds.
+    The keys should be of the form (file checksum, frame index, output size),
+    so every reader of the same file shares the cached frames.
+    The cache holds read-only views of the stored frames, consumers must copy
+    them before modifying. The arrays passed to put stay writeable.
+    """
+
+    def __init__(self, max_size_mb: int = 512):
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._max_size_bytes = max_size_mb * 2**20
+        self._current_size_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        logging.debug(f"Initialized {self}")
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __repr__(self):
+        _size_mb = math.ceil(self._current_size_bytes / 2**20)
+        _max_size_mb = math.ceil(self._max_size_bytes / 2**20)
+        return f"{self.__class__.__name__}(N={len(self)}, max_size={_max_size_mb}MB, filled={_size_mb / _max_size_mb * 100:.2f}%, hit_rate={self.hit_rate:.2f})"
+
+    def __contains__(self, _key):
+        return _key in self._cache
+
+    def __getitem__(self, _key) -> np.ndarray:
+        frame = self.get(_key)
+        if frame is None:
+            raise KeyError(f"Key {_key} not found in cache.")
+        return frame
+
+    def __setitem__(self, _key, _frame):
+        self.put(_key, _frame)
+
+    @property
+    def resident_bytes(self) -> int:
+        return self._current_size_bytes
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def get(self, _key: Hashable, _default=None) -> Optional[np.ndarray]:
+        with self._lock:
+            frame = self._cache.get(_key)
+            if frame is None:
+                self.misses += 1
+                return _default
+            self._cache.move_to_end(_key)
+            self.hits += 1
+            return frame
+
+    def peek(self, _key: Hashable) -> Optional[np.ndarray]:
+        """
+        Returns the cached frame without counting the lookup or refreshing its entry.
+        For opportunistic lookups (e.g. batches) that don't store what they miss.
+        """
+        with self._lock:
+            return self._cache.get(_key)
+
+    def put(self, _key: Hashable, _frame: np.ndarray) -> None:
+        assert isinstance(_frame, np.ndarray), "Frame must be a numpy array."
+
+        if _frame.nbytes > 0.5 * self._max_size_bytes:
+            logging.warning(f"Frame with key={_key} is too large for the cache.")
+            return
+
+        _frame = _frame.view()
+        _frame.flags.writeable = False  # frames are shared between consumers
+        with self._lock:
+            old = self._cache.pop(_key, None)
+            if old is not None:
+                self._current_size_bytes -= old.nbytes
+            self._cache[_key] = _frame
+            self._current_size_bytes += _frame.nbytes
+            self._evict()
+
+    def _evict(self):
+        while self._current_size_bytes > self._max_size_bytes:
+            _, frame = self._cache.popitem(last=False)
+            self._current_size_bytes -= frame.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._current_size_bytes = 0
+        logging.debug(f"Cleared cache -> {self}")
+
+    def set_max_size(self, _max_size_mb: int):
+        with self._lock:
+            self._max_size_bytes = _max_size_mb * 2**20
+            self._evict()
+
+
+_frame_cache = FrameCache()  # Singleton
+
+
+def get_frame_cache() -> FrameCache:
+    return _frame_cache
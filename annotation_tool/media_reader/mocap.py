@@ -1,6 +1,6 @@
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional
 
 import numpy as np
 
@@ -24,6 +24,9 @@ class MocapReader(MediaReader):
     def __get_frame__(self, idx: int) -> np.ndarray:
         return self._mocap_reader.get_frame(idx)
 
+    def __get_batch__(self, indices: Iterable[int]) -> np.ndarray:
+        return self._mocap_reader.get_batch(indices)
+
     def __get_frame_count__(self) -> int:
         return self._mocap_reader.get_frame_count()
 
@@ -32,6 +35,21 @@ class MocapReader(MediaReader):
             self._fps = self._mocap_reader.get_fps()
         return self._fps
 
+    @property
+    def skeleton(self):
+        """
+        How the frames are drawn (a mocap_readers.Skeleton),
+        None if the reader does not know the layout.
+        """
+        return self._mocap_reader.get_skeleton()
+
+    @property
+    def streaming(self) -> bool:
+        """
+        Whether the frames are parsed lazily when they are accessed.
+        """
+        return self._mocap_reader.is_streaming()
+
     def __get_path__(self) -> Path:
         return self._mocap_reader.get_path()
 
@@ -1,2 +1,4 @@
-from .base import MocapReaderBase, get_mocap_reader  # noqa: F401
+from .base import MocapReaderBase, Skeleton, get_mocap_reader  # noqa: F401
+from .bvh_reader import BVHMocapReader  # noqa: F401
+from .c3d_reader import C3DMocapReader  # noqa: F401
 from .lara_reader import LARaMocapReader  # noqa: F401
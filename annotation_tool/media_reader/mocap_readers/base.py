@@ -1,10 +1,33 @@
 import abc
 import dataclasses
+import logging
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional, Union
 
 import numpy as np
 
+from ..base import probe, read_frames
+
+
+@dataclasses.dataclass
+class Skeleton:
+    """
+    Dataclass describing how the frames of a mocap reader are drawn.
+    The drawn points are gathered from a frame by their columns, i.e. point i
+    is at frame[columns[i]] as (x, y, z) with z pointing up. With lines,
+    consecutive pairs of points are the ends of one line, else they are markers.
+    """
+
+    columns: np.ndarray  # (n_points, 3) column indices
+    colors: np.ndarray  # (n_points, 4) RGBA
+    lines: bool = True
+    scale: Union[float, np.ndarray] = 1.0  # to meters, per axis to flip axes
+    floor_points: Optional[np.ndarray] = None  # the lowest marks the floor, all if None
+
+    @property
+    def n_points(self) -> int:
+        return self.columns.shape[0]
+
 
 class MocapReaderBase(abc.ABC):
     """
@@ -37,6 +60,36 @@ class MocapReaderBase(abc.ABC):
         """
         pass
 
+    def get_batch(self, indices: Iterable[int]) -> np.ndarray:
+        """
+        Returns the frames at the given indices as one preallocated array.
+        The default implementation reads the sorted and deduplicated indices
+        one by one, readers should override it if they can do better.
+
+        Args:
+            indices (Iterable[int]): The indices of the frames, any order, duplicates allowed.
+
+        Returns:
+            np.ndarray: The frames in the requested order. The shape is (n, *frame_shape).
+        Raises:
+            IndexError: If any frame index is out of bounds.
+        """
+        return read_frames(self.get_frame, indices, self.get_frame_count())
+
+    def read_range(self, lo: int, hi: int, step: int = 1) -> np.ndarray:
+        """
+        Returns the frames between lo (inclusive) and hi (exclusive).
+
+        Args:
+            lo (int): The lower bound of the frame indices.
+            hi (int): The upper bound of the frame indices.
+            step (int, optional): The step size between frames. Defaults to 1.
+
+        Returns:
+            np.ndarray: The frames. The shape is (n, *frame_shape).
+        """
+        return self.get_batch(range(lo, hi, step))
+
     @abc.abstractmethod
     def get_frame_count(self) -> int:
         """
@@ -57,6 +110,23 @@ class MocapReaderBase(abc.ABC):
         """
         pass
 
+    def get_skeleton(self) -> Optional[Skeleton]:
+        """
+        Returns how the frames are drawn.
+        Readers should override this, data without a skeleton can't be displayed.
+
+        Returns:
+            Optional[Skeleton]: The skeleton or None if the layout is unknown.
+        """
+        return None
+
+    def is_streaming(self) -> bool:
+        """
+        Returns whether the data is read lazily, i.e. accessing all frames
+        at once means parsing the whole file.
+        """
+        return False
+
     @abc.abstractmethod
     def get_path(self) -> Path:
         """
@@ -78,6 +148,22 @@ class MocapReaderBase(abc.ABC):
         """
         return False
 
+    @classmethod
+    def probe(cls, path: Path) -> Optional[dict]:
+        """
+        Cheaply checks whether the reader can open the given file, e.g. by sniffing
+        the file header. The result is passed on to the constructor as the keyword
+        argument probe, so the file only has to be opened once.
+        Readers should override this if is_supported has to load the file.
+
+        Args:
+            path (Path): The path to the mocap file.
+
+        Returns:
+            Optional[dict]: What was learned about the file or None if it is not supported.
+        """
+        return {} if cls.is_supported(path) else None
+
 
 @dataclasses.dataclass
 class RegisteredMocapReader:
@@ -106,6 +192,11 @@ def register_mocap_reader(reader: MocapReaderBase, priority: int = 0):
 
 def get_mocap_reader(path: Path, **kwargs) -> MocapReaderBase:
     for reader in __registered_mocap_readers:
-        if reader.reader.is_supported(path):
-            return reader.reader(path, **kwargs)
+        _probe = probe(reader.reader.probe, path)
+        if _probe is None:
+            continue
+        try:
+            return reader.reader(path, probe=_probe, **kwargs)
+        except (OSError, TypeError, ValueError) as e:
+            logging.debug(f"{reader.reader.__name__} could not open {path}: {e}")
     raise ValueError(f"No mocap_reader found for {path}.")
@@ -0,0 +1,318 @@
+import dataclasses
+import functools
+import logging
+from pathlib import Path
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..base import sorted_unique_indices
+from .base import MocapReaderBase, Skeleton, register_mocap_reader
+from .sidecar import load_with_sidecar
+
+CHUNK_SIZE = 16 * 2**20  # bytes of the motion block parsed at once
+FK_CHUNK_FRAMES = 16384  # frames transformed at once, bounds the memory usage
+BONE_COLOR = (0, 0, 1, 1)  # RGBA
+
+__axes__ = {"X": 0, "Y": 1, "Z": 2}
+
+
+@dataclasses.dataclass
+class BVHJoint:
+    """
+    Dataclass for the joints of a BVH hierarchy.
+    End sites are joints without channels.
+    """
+
+    name: str
+    parent: int
+    offset: np.ndarray
+    channels: List[str] = dataclasses.field(default_factory=list)
+    channel_start: int = 0
+
+
+@dataclasses.dataclass
+class BVHHeader:
+    """
+    Dataclass for the hierarchy and the motion parameters of a BVH file.
+    """
+
+    joints: List[BVHJoint]
+    n_frames: int
+    frame_time: float
+    data_offset: int  # byte offset of the first motion row
+
+    @property
+    def n_channels(self) -> int:
+        return sum(len(joint.channels) for joint in self.joints)
+
+
+def read_bvh_header(path: Path) -> BVHHeader:
+    """
+    Parses the hierarchy and the motion parameters of a BVH file.
+
+    Args:
+        path (Path): The path to the BVH file.
+
+    Returns:
+        BVHHeader: The parsed header.
+
+    Raises:
+        ValueError: If the file is not a valid BVH file.
+    """
+    joints = []
+    stack = []
+    n_channels = 0
+    with open(path, "rb") as f:
+        line = f.readline()
+        while line and not line.strip():
+            line = f.readline()
+        if line.strip().upper() != b"HIERARCHY":
+            raise ValueError(f"{path} is not a BVH file.")
+
+        for line in f:
+            tokens = line.decode("ascii", errors="replace").split()
+            if not tokens:
+                continue
+            keyword = tokens[0].upper()
+            if keyword in ("ROOT", "JOINT"):
+                parent = stack[-1] if stack else -1
+                joints.append(BVHJoint(" ".join(tokens[1:]), parent, np.zeros(3)))
+            elif keyword == "END":
+                name = f"{joints[stack[-1]].name} end"
+                joints.append(BVHJoint(name, stack[-1], np.zeros(3)))
+            elif keyword == "{":
+                stack.append(len(joints) - 1)
+            elif keyword == "}":
+                stack.pop()
+            elif keyword == "OFFSET":
+                joints[stack[-1]].offset = np.array(tokens[1:4], dtype=np.float64)
+            elif keyword == "CHANNELS":
+                joint = joints[stack[-1]]
+                joint.channels = tokens[2 : 2 + int(tokens[1])]
+                joint.channel_start = n_channels
+                n_channels += len(joint.channels)
+            elif keyword == "MOTION":
+                break
+
+        n_frames = int(f.readline().decode("ascii").split(":")[1])
+        frame_time = float(f.readline().decode("ascii").split(":")[1])
+        data_offset = f.tell()
+
+    if not joints or stack:
+        raise ValueError(f"Invalid hierarchy in {path}.")
+    if not frame_time > 0:
+        raise ValueError(f"Invalid frame time {frame_time} in {path}.")
+    return BVHHeader(joints, n_frames, frame_time, data_offset)
+
+
+def load_bvh_positions(path: Path, header: Optional[BVHHeader] = None) -> np.ndarray:
+    """
+    Loads a BVH file and computes the global positions of all joints.
+    The motion block is parsed in bulk and the forward kinematics
+    are evaluated for all frames at once.
+
+    Args:
+        path (Path): The path to the BVH file.
+        header (Optional[BVHHeader]): The parsed header, if already known.
+
+    Returns:
+        np.ndarray: The joint positions (float32) in the units of the file.
+            The shape is (n_frames, n_joints * 3), end sites are included.
+    """
+    if header is None:
+        header = read_bvh_header(path)
+
+    start = time.perf_counter()
+    motion = __parse_motion__(path, header)
+    positions = __forward_kinematics__(motion, header.joints)
+    logging.debug(
+        f"Loaded {motion.shape[0]} frames of {path} "
+        f"in {time.perf_counter() - start:.3f} seconds."
+    )
+    return positions.reshape(positions.shape[0], -1)
+
+
+def __parse_motion__(path: Path, header: BVHHeader) -> np.ndarray:
+    parts = []
+    with open(path, "rb") as f:
+        f.seek(header.data_offset)
+        rest = b""
+        while True:
+            buffer = f.read(CHUNK_SIZE)
+            if not buffer:
+                break
+            buffer = rest + buffer
+            cut = max(buffer.rfind(c) for c in (b"\n", b"\r", b" ", b"\t")) + 1
+            if cut == 0:
+                rest = buffer  # no separator yet, values must not be split
+                continue
+            buffer, rest = buffer[:cut], buffer[cut:]
+            parts.append(np.fromstring(buffer.decode("ascii"), sep=" "))
+        if rest.strip():
+            parts.append(np.fromstring(rest.decode("ascii"), sep=" "))
+
+    values = np.concatenate(parts) if parts else np.empty(0)
+    n_channels = max(1, header.n_channels)
+    n_frames = min(header.n_frames, values.size // n_channels)
+    if n_frames < header.n_frames:
+        logging.warning(
+            f"{path} contains {n_frames} of {header.n_frames} frames, "
+            "the motion block is truncated."
+        )
+    return values[: n_frames * n_channels].reshape(n_frames, n_channels)
+
+
+def __axis_rotations__(axis: int, degrees: np.ndarray) -> np.ndarray:
+    """
+    Returns the rotation matrices around one axis for all angles, shape (n, 3, 3).
+    """
+    radians = np.radians(degrees)
+    cos, sin = np.cos(radians), np.sin(radians)
+    i, j = (axis + 1) % 3, (axis + 2) % 3
+
+    rotations = np.zeros((degrees.shape[0], 3, 3))
+    rotations[:, axis, axis] = 1
+    rotations[:, i, i] = cos
+    rotations[:, i, j] = -sin
+    rotations[:, j, i] = sin
+    rotations[:, j, j] = cos
+    return rotations
+
+
+def __local_transform__(
+    motion: np.ndarray, joint: BVHJoint
+) -> Tuple[Optional[np.ndarray], np.ndarray]:
+    """
+    Returns the local rotations (None if the joint does not rotate)
+    and the local translations of a joint for all frames.
+    """
+    data = motion[:, joint.channel_start : joint.channel_start + len(joint.channels)]
+
+    translation = np.broadcast_to(joint.offset, (motion.shape[0], 3))
+    rotation = None
+    for k, channel in enumerate(joint.channels):
+        axis = __axes__.get(channel[:1].upper())
+        if axis is None:
+            continue
+        if channel[1:].lower() == "position":
+            if not translation.flags.writeable:
+                translation = translation.copy()
+            translation[:, axis] = data[:, k]
+        elif channel[1:].lower() == "rotation":
+            _rotation = __axis_rotations__(axis, data[:, k])
+            rotation = _rotation if rotation is None else rotation @ _rotation
+    return rotation, translation
+
+
+def __forward_kinematics__(motion: np.ndarray, joints: List[BVHJoint]) -> np.ndarray:
+    """
+    Computes the global joint positions for all frames.
+    Joints are stored in hierarchy order, so parents are always transformed
+    before their children. Every step is a batched matrix product over the frames.
+    """
+    n_frames = motion.shape[0]
+    positions = np.empty((n_frames, len(joints), 3), dtype=np.float32)
+
+    for lo in range(0, n_frames, FK_CHUNK_FRAMES):
+        chunk = motion[lo : lo + FK_CHUNK_FRAMES]
+        rotations = [None] * len(joints)
+        _positions = np.empty((chunk.shape[0], len(joints), 3))
+
+        for j, joint in enumerate(joints):
+            rotation, translation = __local_transform__(chunk, joint)
+            if joint.parent < 0:
+                _positions[:, j] = translation
+                rotations[j] = rotation
+                continue
+
+            parent_rotation = rotations[joint.parent]
+            if parent_rotation is None:
+                _positions[:, j] = _positions[:, joint.parent] + translation
+                rotations[j] = rotation
+            else:
+                _positions[:, j] = _positions[:, joint.parent] + np.einsum(
+                    "nij,nj->ni", parent_rotation, translation
+                )
+                rotations[j] = (
+                    parent_rotation if rotation is None else parent_rotation @ rotation
+                )
+
+        positions[lo : lo + chunk.shape[0]] = _positions
+    return positions
+
+
+class BVHMocapReader(MocapReaderBase):
+    """Class for reading BVH (Biovision hierarchy) mocap data."""
+
+    def __init__(self, path, **kwargs) -> None:
+        """
+        Initializes a new BVHMocapReader object.
+        The frames are the global positions of all joints, see load_bvh_positions.
+
+        Args:
+            path (Path): The path to the BVH file.
+
+        Raises:
+            ValueError: If the file is not a valid BVH file.
+        """
+        self.path = path
+        self.header = read_bvh_header(path)
+        self.labels = [joint.name for joint in self.header.joints]
+        self.parents = np.array([joint.parent for joint in self.header.joints])
+
+        self.mocap = load_with_sidecar(
+            path, "positions", functools.partial(load_bvh_positions, path, self.header)
+        )
+
+    def get_frame(self, frame_idx: int) -> np.ndarray:
+        if frame_idx < 0 or frame_idx >= self.get_frame_count():
+            raise IndexError("Index out of range.")
+        return self.mocap[frame_idx]
+
+    def get_batch(self, indices: Iterable[int]) -> np.ndarray:
+        unique, inverse = sorted_unique_indices(indices, self.get_frame_count())
+        frames = self.mocap[unique]
+        return frames if inverse is None else frames[inverse]
+
+    def read_range(self, lo: int, hi: int, step: int = 1) -> np.ndarray:
+        if lo < 0 or hi > self.get_frame_count():
+            raise IndexError("Index out of range.")
+        return self.mocap[lo:hi:step]
+
+    def get_frame_count(self) -> int:
+        return self.mocap.shape[0]
+
+    def get_skeleton(self) -> Skeleton:
+        # every joint is connected to its parent, BVH files are Y-up and in centimeters
+        bones = [(i, p) for i, p in enumerate(self.parents) if p >= 0]
+        points = np.array(bones, dtype=np.int64).reshape(-1)
+        return Skeleton(
+            columns=points[:, np.newaxis] * 3 + np.array([0, 2, 1]),
+            colors=np.tile(np.array(BONE_COLOR, dtype=np.float32), (len(points), 1)),
+            scale=np.array([0.01, -0.01, 0.01]),  # (x, -z, y) is a rotation
+        )
+
+    def get_fps(self) -> float:
+        return 1 / self.header.frame_time
+
+    def get_path(self) -> Path:
+        return self.path
+
+    @classmethod
+    def probe(cls, path: Path) -> Optional[dict]:
+        try:
+            with open(path, "rb") as f:
+                magic = f.read(64).lstrip()
+        except OSError:
+            return None
+        return {} if magic.upper().startswith(b"HIERARCHY") else None
+
+    @staticmethod
+    def is_supported(path: Path) -> bool:
+        return BVHMocapReader.probe(path) is not None
+
+
+register_mocap_reader(BVHMocapReader, 0)
+logging.info("Registered BVH mocap reader.")
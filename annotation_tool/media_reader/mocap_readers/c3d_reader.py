@@ -0,0 +1,284 @@
+import dataclasses
+import functools
+import logging
+from pathlib import Path
+import struct
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from ..base import sorted_unique_indices
+from .base import MocapReaderBase, Skeleton, register_mocap_reader
+from .sidecar import load_with_sidecar
+
+BLOCK_SIZE = 512  # C3D files are organized in blocks of 512 bytes
+
+# processor types stored in the parameter section
+INTEL, DEC, MIPS = 84, 85, 86
+
+MARKER_COLOR = (1, 1, 0, 1)  # RGBA
+__units__ = {"mm": 0.001, "cm": 0.01, "m": 1.0}  # to meters
+
+
+@dataclasses.dataclass
+class C3DHeader:
+    """
+    Dataclass for the header and the POINT parameters of a C3D file.
+    """
+
+    processor: int
+    n_points: int
+    n_analog: int  # analog samples per 3D frame, over all channels
+    n_frames: int
+    scale: float  # negative if the points are stored as floats
+    data_start: int  # block number of the point data (1-based)
+    fps: float
+    labels: List[str]
+    units: str = "mm"
+
+    @property
+    def endian(self) -> str:
+        return ">" if self.processor == MIPS else "<"
+
+
+def __floats__(buffer: bytes, processor: int) -> np.ndarray:
+    """
+    Decodes float32 values, DEC floats are converted to IEEE.
+    """
+    if processor == DEC:
+        # DEC floats store the high word first and are four times larger
+        words = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, 4)[:, [2, 3, 0, 1]]
+        return np.ascontiguousarray(words).view("<f4").ravel() / 4
+    return np.frombuffer(buffer, dtype=">f4" if processor == MIPS else "<f4")
+
+
+def __read_parameters__(buffer: bytes, processor: int) -> Dict[str, object]:
+    """
+    Parses the parameter section into a dict with keys like "POINT:LABELS".
+    """
+    endian = ">" if processor == MIPS else "<"
+    groups = {}
+    raw = {}
+
+    pos = 4  # skip the header of the parameter section
+    while pos + 2 <= len(buffer):
+        n_chars, group_id = struct.unpack("bb", buffer[pos : pos + 2])
+        if n_chars == 0:
+            break
+        name_end = pos + 2 + abs(n_chars)
+        name = buffer[pos + 2 : name_end].decode("ascii", errors="replace").upper()
+        (next_offset,) = struct.unpack(endian + "h", buffer[name_end : name_end + 2])
+        body = name_end + 2
+
+        if group_id < 0:
+            groups[-group_id] = name
+        else:
+            elem_size, n_dims = struct.unpack("bB", buffer[body : body + 2])
+            dims = list(buffer[body + 2 : body + 2 + n_dims])
+            data_start = body + 2 + n_dims
+            data_end = data_start + abs(elem_size) * int(np.prod(dims))
+            raw[(group_id, name)] = (elem_size, dims, buffer[data_start:data_end])
+
+        if next_offset == 0:
+            break
+        pos = name_end + next_offset
+
+    parameters = {}
+    for (group_id, name), (elem_size, dims, data) in raw.items():
+        key = f"{groups.get(group_id, group_id)}:{name}"
+        if elem_size == -1:
+            if len(dims) < 2:
+                parameters[key] = data.decode("ascii", errors="replace").strip()
+            else:
+                length = dims[0]
+                parameters[key] = [
+                    data[i : i + length].decode("ascii", errors="replace").strip()
+                    for i in range(0, len(data), length)
+                ]
+        elif elem_size == 1:
+            parameters[key] = np.frombuffer(data, dtype=np.uint8)
+        elif elem_size == 2:
+            parameters[key] = np.frombuffer(data, dtype=endian + "i2")
+        elif elem_size == 4:
+            parameters[key] = __floats__(data, processor)
+    return parameters
+
+
+def read_c3d_header(path: Path) -> C3DHeader:
+    """
+    Parses the header and the parameters describing the 3D points of a C3D file.
+
+    Args:
+        path (Path): The path to the C3D file.
+
+    Returns:
+        C3DHeader: The parsed header.
+
+    Raises:
+        ValueError: If the file is not a valid C3D file.
+    """
+    with open(path, "rb") as f:
+        header = f.read(BLOCK_SIZE)
+        if len(header) < BLOCK_SIZE or header[1] != 0x50:
+            raise ValueError(f"{path} is not a C3D file.")
+
+        f.seek((header[0] - 1) * BLOCK_SIZE)
+        section = f.read(4)
+        if len(section) < 4 or section[3] not in (INTEL, DEC, MIPS):
+            raise ValueError(f"Unknown processor type in {path}.")
+        processor = section[3]
+        f.seek((header[0] - 1) * BLOCK_SIZE)
+        try:
+            parameters = __read_parameters__(
+                f.read(max(1, section[2]) * BLOCK_SIZE), processor
+            )
+        except struct.error as e:
+            raise ValueError(f"Invalid parameter section in {path}: {e}")
+
+    endian = ">" if processor == MIPS else "<"
+    n_points, n_analog, first, last = struct.unpack(endian + "4H", header[2:10])
+    (data_start,) = struct.unpack(endian + "H", header[16:18])
+    scale = float(__floats__(header[12:16], processor)[0])
+    fps = float(__floats__(header[20:24], processor)[0])
+    if not fps > 0:
+        raise ValueError(f"Invalid frame rate {fps} in {path}.")
+
+    n_frames = last - first + 1
+    frames = parameters.get("POINT:FRAMES")
+    if frames is not None and len(frames) > 0:
+        # the header only holds 16 bit frame numbers, integer parameters are unsigned
+        value = int(frames[0]) & 0xFFFF if frames.dtype.kind == "i" else int(frames[0])
+        n_frames = max(n_frames, value)
+
+    labels = parameters.get("POINT:LABELS", [])
+    labels = labels if isinstance(labels, list) else [labels]
+    labels = (labels + [f"point {i}" for i in range(len(labels), n_points)])[:n_points]
+
+    units = parameters.get("POINT:UNITS", "mm")
+    units = units if isinstance(units, str) else "mm"
+
+    return C3DHeader(
+        processor, n_points, n_analog, n_frames, scale, data_start, fps, labels, units
+    )
+
+
+def load_c3d_points(path: Path, header: Optional[C3DHeader] = None) -> np.ndarray:
+    """
+    Loads the 3D points of a C3D file.
+    All frames are decoded at once, analog samples are skipped.
+
+    Args:
+        path (Path): The path to the C3D file.
+        header (Optional[C3DHeader]): The parsed header, if already known.
+
+    Returns:
+        np.ndarray: The point positions (float32) in the units of the file,
+            NaN where a point is invalid. The shape is (n_frames, n_points * 3).
+    """
+    if header is None:
+        header = read_c3d_header(path)
+
+    is_float = header.scale < 0
+    itemsize = 4 if is_float else 2
+    values_per_frame = 4 * header.n_points + header.n_analog
+    frame_bytes = max(1, values_per_frame * itemsize)
+
+    with open(path, "rb") as f:
+        f.seek((header.data_start - 1) * BLOCK_SIZE)
+        buffer = f.read(header.n_frames * frame_bytes)
+
+    n_frames = len(buffer) // frame_bytes
+    if n_frames < header.n_frames:
+        logging.warning(
+            f"{path} contains {n_frames} of {header.n_frames} frames, "
+            "the point data is truncated."
+        )
+    buffer = buffer[: n_frames * frame_bytes]
+
+    if is_float:
+        values = __floats__(buffer, header.processor)
+    else:
+        values = np.frombuffer(buffer, dtype=header.endian + "i2")
+    values = values.reshape(n_frames, values_per_frame)[:, : 4 * header.n_points]
+    values = values.reshape(n_frames, header.n_points, 4)
+
+    points = values[..., :3].astype(np.float32)
+    if not is_float:
+        points *= abs(header.scale)
+    points[values[..., 3] < 0] = np.nan  # a negative residual marks invalid points
+    return points.reshape(n_frames, -1)
+
+
+class C3DMocapReader(MocapReaderBase):
+    """Class for reading C3D mocap data."""
+
+    def __init__(self, path, **kwargs) -> None:
+        """
+        Initializes a new C3DMocapReader object.
+        The frames are the positions of all points, see load_c3d_points.
+
+        Args:
+            path (Path): The path to the C3D file.
+
+        Raises:
+            ValueError: If the file is not a valid C3D file.
+        """
+        self.path = path
+        self.header = read_c3d_header(path)
+        self.labels = self.header.labels
+
+        self.mocap = load_with_sidecar(
+            path, "points", functools.partial(load_c3d_points, path, self.header)
+        )
+
+    def get_frame(self, frame_idx: int) -> np.ndarray:
+        if frame_idx < 0 or frame_idx >= self.get_frame_count():
+            raise IndexError("Index out of range.")
+        return self.mocap[frame_idx]
+
+    def get_batch(self, indices: Iterable[int]) -> np.ndarray:
+        unique, inverse = sorted_unique_indices(indices, self.get_frame_count())
+        frames = self.mocap[unique]
+        return frames if inverse is None else frames[inverse]
+
+    def read_range(self, lo: int, hi: int, step: int = 1) -> np.ndarray:
+        if lo < 0 or hi > self.get_frame_count():
+            raise IndexError("Index out of range.")
+        return self.mocap[lo:hi:step]
+
+    def get_frame_count(self) -> int:
+        return self.mocap.shape[0]
+
+    def get_skeleton(self) -> Skeleton:
+        # markers are not connected, C3D files are Z-up
+        n_points = self.header.n_points
+        return Skeleton(
+            columns=np.arange(n_points)[:, np.newaxis] * 3 + np.arange(3),
+            colors=np.tile(np.array(MARKER_COLOR, dtype=np.float32), (n_points, 1)),
+            lines=False,
+            scale=__units__.get(self.header.units.strip().lower(), 0.001),
+        )
+
+    def get_fps(self) -> float:
+        return self.header.fps
+
+    def get_path(self) -> Path:
+        return self.path
+
+    @classmethod
+    def probe(cls, path: Path) -> Optional[dict]:
+        try:
+            with open(path, "rb") as f:
+                magic = f.read(2)
+        except OSError:
+            return None
+        # the first byte points to the parameter section, which follows the header
+        return {} if len(magic) == 2 and magic[0] >= 2 and magic[1] == 0x50 else None
+
+    @staticmethod
+    def is_supported(path: Path) -> bool:
+        return C3DMocapReader.probe(path) is not None
+
+
+register_mocap_reader(C3DMocapReader, 0)
+logging.info("Registered C3D mocap reader.")
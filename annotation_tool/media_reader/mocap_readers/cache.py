@@ -1,51 +1,254 @@
-import io
+import abc
+from collections import OrderedDict
 import logging
 import math
+import os
+from pathlib import Path
 import threading
-from typing import Optional
+from typing import Hashable, List, Optional, Tuple, Union
+import zlib
 
 import numpy as np
 
+from annotation_tool.file_cache import application_subdir
 
-class CompressedArray:
-    def __init__(self, arr: np.ndarray, compress):
-        self._compressed = compress
+from .row_index import BlockRows
 
-        if compress:
-            compressed_data = io.BytesIO()
-            np.savez_compressed(compressed_data, arr)
-            logging.debug(
-                f"Compressed {arr.nbytes / 1024} KB to {compressed_data.getbuffer().nbytes / 1024} KB"
-            )
-            self._arr: io.BytesIO = compressed_data
-        else:
-            self._arr: np.ndarray = arr
+
+class Codec(abc.ABC):
+    """
+    Abstract codec for compressing the chunks of cached arrays.
+    """
+
+    @abc.abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        pass
+
+    @abc.abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        pass
+
+
+class ZlibCodec(Codec):
+    """
+    Fast zlib compression from the standard library, level 1 by default.
+    """
+
+    def __init__(self, level: int = 1):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class CompressedArray(BlockRows):
+    """
+    Array compressed in fixed-size chunks of rows.
+    Indexing only decompresses the chunks covering the requested rows,
+    recently used chunks are kept decompressed.
+    """
+
+    CHUNK_BYTES = 256 * 2**10  # uncompressed size of a chunk
+    MAX_CHUNKS = 8  # decompressed chunks kept per array
+
+    def __init__(self, arr: np.ndarray, codec: Codec):
+        row_bytes = max(1, arr[0].nbytes if arr.ndim > 0 and len(arr) > 0 else 1)
+        chunk_rows = max(1, self.CHUNK_BYTES // row_bytes)
+        super().__init__(len(arr), chunk_rows, self.MAX_CHUNKS)
+        self._row_shape = arr.shape[1:]
+        self.dtype = arr.dtype
+        self._codec = codec
+
+        self._chunks = [
+            codec.compress(np.ascontiguousarray(arr[lo : lo + chunk_rows]).tobytes())
+            for lo in range(0, len(arr), chunk_rows)
+        ]
+        logging.debug(f"Compressed {arr.nbytes / 1024} KB to {self.nbytes / 1024} KB")
 
     @property
-    def data(self):
-        if self._compressed:
-            self._arr.seek(0)
-            return np.load(self._arr)["arr_0"]
-        else:
-            return self._arr
+    def nbytes(self) -> int:
+        return sum(len(chunk) for chunk in self._chunks)
 
     @property
-    def nbytes(self):
-        if self._compressed:
-            return self._arr.getbuffer().nbytes
-        else:
-            return self._arr.nbytes
+    def data(self) -> np.ndarray:
+        return self[:]
+
+    def _read_block(self, block_idx: int) -> np.ndarray:
+        buffer = self._codec.decompress(self._chunks[block_idx])
+        return np.frombuffer(buffer, dtype=self.dtype).reshape((-1,) + self._row_shape)
+
+
+class SidecarStore(object):
+    """
+    Persistent store of parsed arrays (sidecars), bounded by the number of bytes it stores.
+    Arrays are stored as .npy files that are memory-mapped on lookup.
+    The modification times of the files keep the LRU order, so the store survives
+    restarts of the tool. The directory is only scanned on first use,
+    afterwards a running byte total is kept.
+    """
+
+    def __init__(self, directory: Path, max_size_mb: int = 2048):
+        self.directory = Path(directory)
+        self._max_size_bytes = max_size_mb * 2**20
+        self._files = None  # file name -> size in LRU order, loaded lazily
+        self._current_size_bytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, _key):
+        return self.path(_key).is_file()
+
+    @property
+    def resident_bytes(self) -> int:
+        with self._lock:
+            self._index()
+            return self._current_size_bytes
+
+    def path(self, _key: Tuple[str, ...]) -> Path:
+        """
+        Returns the location of the sidecar for the given key, e.g. (checksum, variant).
+        """
+        return Path(self.directory, f"{'_'.join(map(str, _key))}.npy")
+
+    def _index(self) -> OrderedDict:
+        if self._files is None:
+            files = []
+            for path in self.directory.glob("*.npy"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime_ns, path.name, stat.st_size))
+            self._files = OrderedDict((name, size) for _, name, size in sorted(files))
+            self._current_size_bytes = sum(self._files.values())
+        return self._files
+
+    def get(self, _key) -> Optional[np.ndarray]:
+        path = self.path(_key)
+        try:
+            data = np.load(path, mmap_mode="r")
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            files = self._index()
+            if path.name in files:
+                files.move_to_end(path.name)
+        return data
+
+    def put(self, _key, _data: np.ndarray) -> None:
+        path = self.path(_key)
+        try:
+            if path.is_file():
+                os.utime(path)  # already stored, e.g. promoted from this store
+                with self._lock:
+                    files = self._index()
+                    if path.name in files:
+                        files.move_to_end(path.name)
+                return
+            tmp = self.partial_path(_key)
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(_data))
+        except OSError as e:
+            logging.warning(f"Could not store {_key} on disk: {e}")
+            return
+        self.commit(_key)
+
+    def partial_path(self, _key) -> Path:
+        """
+        Returns where the sidecar for the given key is written before it is committed.
+        """
+        return self.path(_key).with_suffix(".part")
+
+    def commit(self, _key) -> None:
+        """
+        Moves the completely written partial sidecar of the given key into the store.
+        """
+        path = self.path(_key)
+        try:
+            os.replace(
+                self.partial_path(_key), path
+            )  # readers never see a partial file
+            size = path.stat().st_size
+        except OSError as e:
+            logging.warning(f"Could not store {_key} on disk: {e}")
+            return
+
+        with self._lock:
+            files = self._index()
+            self._current_size_bytes += size - files.pop(path.name, 0)
+            files[path.name] = size
+            self._evict(keep=path.name)
+
+    def _evict(self, keep: Optional[str]):
+        in_use = []
+        while self._current_size_bytes > self._max_size_bytes and self._files:
+            name, size = self._files.popitem(last=False)
+            if name == keep:
+                in_use.append((name, size))
+                continue
+            try:
+                os.remove(Path(self.directory, name))
+                self._current_size_bytes -= size
+            except FileNotFoundError:
+                self._current_size_bytes -= size
+            except OSError:
+                in_use.append((name, size))  # still mapped by a reader
+        for name, size in in_use:
+            self._files[name] = size
+
+    def set_max_size(self, _max_size_mb: int):
+        with self._lock:
+            self._index()
+            self._max_size_bytes = _max_size_mb * 2**20
+            self._evict(keep=None)
+
+    def clear(self):
+        with self._lock:
+            for name in list(self._index()):
+                try:
+                    os.remove(Path(self.directory, name))
+                except OSError:
+                    continue
+                self._current_size_bytes -= self._files.pop(name)
 
 
 class ArrayCache(object):
-    def __init__(self, max_size_mb: int = 256, compress=False):
-        self._cache = []
+    """
+    LRU cache for whole arrays (e.g. parsed mocap recordings),
+    bounded by the number of bytes it stores.
+    Lookups return read-only views instead of copies,
+    consumers must copy them before modifying. The arrays passed to put stay writeable.
+    With compression enabled, arrays are stored as compressed chunks of rows
+    and lookups return the CompressedArray, a read-only array-like that only
+    decompresses the chunks covering the rows that are indexed.
+    Evicted arrays are spilled to an optional SidecarStore and promoted back
+    as memory-mapped arrays.
+    """
+
+    def __init__(
+        self,
+        max_size_mb: int = 256,
+        compress=False,
+        codec: Optional[Codec] = None,
+        disk_tier: Optional[SidecarStore] = None,
+    ):
+        self._cache = OrderedDict()
         self._lock = threading.Lock()
         self._compress = compress
+        self._codec = codec if codec is not None else ZlibCodec()
+        self._disk_tier = disk_tier
 
         self._max_size_bytes = max_size_mb * 2**20
         self._current_size_bytes = 0
 
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+
         logging.debug(f"Initialized {self}")
 
     def __len__(self):
@@ -58,46 +261,97 @@ class ArrayCache(object):
         return f"{self.__class__.__name__}(N={_len}, max_size={_max_size_mb}MB, filled={_size_mb / _max_size_mb * 100:.2f}%, compress={self._compress})"
 
     def __contains__(self, _key):
-        return _key in [k for k, _ in self._cache]
+        if _key in self._cache:
+            return True
+        return self._disk_tier is not None and _key in self._disk_tier
 
-    def __getitem__(self, _key):
+    def __getitem__(self, _key) -> Union[np.ndarray, CompressedArray]:
         with self._lock:
-            for k, data in self._cache:
-                if k == _key:
-                    _data = data.data
-                    self._cache.remove((k, data))
-                    self._cache.append((k, data))  # move to end
-                    return _data.copy()
-        raise KeyError(f"Key {_key} not found in cache.")
+            data = self._cache.get(_key)
+            if data is not None:
+                self._cache.move_to_end(_key)
+                self.hits += 1
+
+        if data is None:
+            data = self._disk_tier.get(_key) if self._disk_tier is not None else None
+            if data is None:
+                with self._lock:
+                    self.misses += 1
+                raise KeyError(f"Key {_key} not found in cache.")
+            with self._lock:
+                self.hits += 1
+                self.disk_hits += 1
+            if data.nbytes <= 0.9 * self._max_size_bytes:
+                self.__insert__(_key, data)  # promote the mapped array, no copy
+
+        if isinstance(data, CompressedArray):
+            return data  # rows are decompressed on access, never modified
+        _data = data.view()
+        _data.flags.writeable = False
+        return _data
 
     def __setitem__(self, _key, _value):
         self.__put__(_key, _value)
 
+    @property
+    def resident_bytes(self) -> int:
+        return self._current_size_bytes
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
     def __put__(self, _key, _data: np.ndarray) -> None:
         assert isinstance(_data, np.ndarray), "Data must be a numpy array."
 
-        with self._lock:
-            compressed_data = CompressedArray(_data, self._compress)
-
-            if compressed_data.nbytes > 0.9 * self._max_size_bytes:
-                logging.warning(
-                    f"Object with key={_key} is larger than the cache size. Skipping."
-                )
-                return
+        _data = _data.view()
+        _data.flags.writeable = False  # the cached array is shared with consumers
+        if self._compress:
+            compressed_data = CompressedArray(_data, self._codec)
+        else:
+            compressed_data = _data
 
-            self._current_size_bytes += compressed_data.nbytes
-            self._evict()
-            self._cache.append((_key, compressed_data))
+        if compressed_data.nbytes > 0.9 * self._max_size_bytes:
+            logging.warning(
+                f"Object with key={_key} is larger than the cache size. Skipping."
+            )
+            if self._disk_tier is not None:
+                self._disk_tier.put(_key, _data)
+            return
 
+        self.__insert__(_key, compressed_data)
         logging.debug(f"Added {_key} to cache -> {self}")
 
-    def _evict(self):
-        untouched = True
+    def __insert__(self, _key, _data: Union[np.ndarray, CompressedArray]) -> None:
+        with self._lock:
+            old = self._cache.pop(_key, None)
+            if old is not None:
+                self._current_size_bytes -= old.nbytes
+            self._cache[_key] = _data
+            self._current_size_bytes += _data.nbytes
+            evicted = self._evict()
+        self.__spill__(evicted)
+
+    def _evict(self) -> List[Tuple[Hashable, Union[np.ndarray, CompressedArray]]]:
+        evicted = []
         while self._current_size_bytes > self._max_size_bytes:
-            self._current_size_bytes -= self._cache.pop(0).data.nbytes
-            untouched = False
-        if not untouched:
+            _key, data = self._cache.popitem(last=False)
+            self._current_size_bytes -= data.nbytes  # the stored size
+            self.evictions += 1
+            evicted.append((_key, data))
+        if evicted:
             logging.debug(f"Evicted cache -> {self}")
+        return evicted
+
+    def __spill__(self, evicted) -> None:
+        # writing to disk happens outside the lock
+        if self._disk_tier is None:
+            return
+        for _key, data in evicted:
+            if isinstance(data, CompressedArray):
+                data = data.data
+            self._disk_tier.put(_key, data)
 
     def clear(self):
         with self._lock:
@@ -105,7 +359,7 @@ class ArrayCache(object):
             self._current_size_bytes = 0
         logging.debug(f"Cleared cache -> {self}")
 
-    def get(self, _key, _default=None) -> Optional[np.ndarray]:
+    def get(self, _key, _default=None) -> Optional[Union[np.ndarray, CompressedArray]]:
         try:
             return self[_key]
         except KeyError:
@@ -114,15 +368,21 @@ class ArrayCache(object):
     def set_max_size(self, _max_size_kb: int):
         with self._lock:
             self._max_size_bytes = _max_size_kb * 1024
-            self._evict()
+            evicted = self._evict()
+        self.__spill__(evicted)
 
     def set_compress(self, _compress: bool):
         with self._lock:
             self._compress = _compress
 
 
-_mocap_cache = ArrayCache()  # Singleton
+_sidecar_store = SidecarStore(application_subdir("mocap"))  # Singleton
+_mocap_cache = ArrayCache(disk_tier=_sidecar_store)  # Singleton
 
 
 def get_cache() -> ArrayCache:
     return _mocap_cache
+
+
+def get_sidecar_store() -> SidecarStore:
+    return _sidecar_store
@@ -1,95 +1,174 @@
+import functools
 import logging
+import os
 from pathlib import Path
+from typing import Iterable, Optional, Union
 
 import numpy as np
 
-from annotation_tool.utility.filehandler import checksum
+from annotation_tool.utility.csv_parser import parse_csv
 
-from .base import MocapReaderBase, register_mocap_reader
-from .cache import get_cache
+from ..base import sorted_unique_indices
+from .base import MocapReaderBase, Skeleton, register_mocap_reader
+from .row_index import BLOCK_ROWS, BlockRows, LazyRows, line_offsets
+from .sidecar import SidecarRecorder, has_sidecar, load_with_sidecar
 
+STREAM_THRESHOLD = 256 * 2**20  # larger files are parsed lazily until mapped
 
-def load_lara_mocap(path: Path, normalize: bool) -> np.ndarray:
+
+def load_lara_mocap(
+    path: Path, normalize: bool, header_lines: Optional[int] = None
+) -> Union[np.ndarray, BlockRows]:
     """
     Loads the LARa-mocap data from a file.
+    The parsed data is stored as a binary sidecar in the application directory,
+    so later loads map it into memory instead of parsing the CSV again.
 
     Args:
         path (Path): The path to the LARa-mocap file.
         normalize (bool): Whether to normalize the data to the center of the coordinate system.
+        header_lines (Optional[int]): The number of header lines, if already known.
 
     Returns:
-        np.ndarray: The mocap data.
+        Union[np.ndarray, BlockRows]: The mocap data, read-only,
+            see load_with_sidecar.
 
     Raises:
         AssertionError: If the data type is not supported.
     """
-    _hash = checksum(path)
-    _key = (_hash, normalize)
+    return load_with_sidecar(
+        path,
+        __variant__(normalize),
+        functools.partial(__load_lara_mocap__, path, normalize, header_lines),
+    )
 
-    if get_cache is None:
-        return __load_lara_mocap__(path, normalize)
-    else:
-        _cache = get_cache()
 
-        if _key in _cache:
-            return _cache[_key]
-        else:
-            mocap = __load_lara_mocap__(path, normalize)
-            _cache[_key] = mocap
-            return mocap
+def open_lara_mocap_lazy(
+    path: Path, normalize: bool, header_lines: Optional[int] = None
+) -> LazyRows:
+    """
+    Opens the LARa-mocap data without loading it.
+    Only a line-offset index is built, rows are parsed when they are accessed.
+    Once all rows have been read, they are stored as a sidecar for later loads.
 
+    Args:
+        path (Path): The path to the LARa-mocap file.
+        normalize (bool): Whether to normalize the data to the center of the coordinate system.
+        header_lines (Optional[int]): The number of header lines, if already known.
 
-def __load_lara_mocap__(path: Path, normalize: bool) -> np.ndarray:
-    def is_data_row(line2check: str) -> bool:
-        """
-        Checks if a line is a data row.
-        Specific checking for the LARa dataset.
+    Returns:
+        LazyRows: Array-like view of the mocap data.
 
-        Args:
-            line2check (str): Line to check.
+    Raises:
+        TypeError: If the data type is not supported.
+    """
+    try:
+        if header_lines is None:
+            header_lines = __count_header_lines__(path)
+        if header_lines not in [1, 5]:
+            raise TypeError("The number of header lines is not supported.")
+
+        offsets = line_offsets(path, header_lines)
+        parse_block = functools.partial(__parse_lara_block__, normalize=normalize)
+        recorder = SidecarRecorder(
+            path, __variant__(normalize), offsets.size - 1, BLOCK_ROWS
+        )
+        return LazyRows(path, offsets, parse_block, on_block=recorder.record)
+    except Exception:
+        raise TypeError("Loading mocap failed.")
+
+
+def has_lara_sidecar(path: Path, normalize: bool) -> bool:
+    """
+    Returns whether the LARa-mocap data has already been parsed into a sidecar.
+    """
+    return has_sidecar(path, __variant__(normalize))
+
+
+def __parse_lara_block__(buffer: bytes, normalize: bool) -> np.ndarray:
+    lines = [line for line in buffer.splitlines() if line.strip()]  # see line_offsets
+    array = np.loadtxt(lines, delimiter=",", dtype=np.float64, ndmin=2)
+    return __postprocess_lara_mocap__(array, normalize)
 
-        Returns:
-            bool: True if the line is a data row.
-        """
-        try:
-            tst_array = np.fromstring(line2check, dtype=np.float64, sep=",")
-            return tst_array.shape[0] in [132, 133, 134]
-        except ValueError:
-            return False
 
+def __variant__(normalize: bool) -> str:
+    return "normalized" if normalize else "raw"
+
+
+def __is_data_row__(line2check: str) -> bool:
+    """
+    Checks if a line is a data row.
+    Specific checking for the LARa dataset.
+
+    Args:
+        line2check (str): Line to check.
+
+    Returns:
+        bool: True if the line is a data row.
+    """
     try:
-        # Check number of header lines:
-        with open(path, "r") as f:
-            header_lines = 0
-            for line in f:
-                if is_data_row(line):
-                    break
-                else:
-                    header_lines += 1
-                if header_lines > 5:
-                    raise TypeError("Too many header lines in mocap file.")
+        tst_array = np.fromstring(line2check, dtype=np.float64, sep=",")
+        return tst_array.shape[0] in [132, 133, 134]
+    except ValueError:
+        return False
 
-        if header_lines in [1, 5]:
-            array = np.loadtxt(
-                path, delimiter=",", skiprows=header_lines, dtype=np.float64
-            )
 
-            if array.shape[1] == 134:
-                array = array[:, 2:]
+def __count_header_lines__(path: Path) -> int:
+    """
+    Counts the header lines of a LARa-mocap file, reading at most 6 lines.
+
+    Args:
+        path (Path): The path to the LARa-mocap file.
 
-            if array.shape[1] == 133:
-                array = array[:, 1:]
+    Returns:
+        int: The number of lines before the first data row.
 
-            if normalize:
-                array = __normalize_lara_mocap__(array)
+    Raises:
+        TypeError: If there are too many header lines.
+    """
+    with open(path, "r") as f:
+        header_lines = 0
+        for line in f:
+            if __is_data_row__(line):
+                break
+            else:
+                header_lines += 1
+            if header_lines > 5:
+                raise TypeError("Too many header lines in mocap file.")
+    return header_lines
+
+
+def __load_lara_mocap__(
+    path: Path, normalize: bool, header_lines: Optional[int] = None
+) -> np.ndarray:
+    try:
+        if header_lines is None:
+            header_lines = __count_header_lines__(path)
 
-            return array
+        if header_lines in [1, 5]:
+            array = parse_csv(
+                path, delimiter=",", skip_header=header_lines, allow_missing=False
+            )
+            return __postprocess_lara_mocap__(array, normalize)
         else:
             raise TypeError("The number of header lines is not supported.")
     except Exception:
         raise TypeError("Loading mocap failed.")
 
 
+def __postprocess_lara_mocap__(array: np.ndarray, normalize: bool) -> np.ndarray:
+    if array.shape[1] == 134:
+        array = array[:, 2:]
+
+    if array.shape[1] == 133:
+        array = array[:, 1:]
+
+    if normalize:
+        array = __normalize_lara_mocap__(array)
+
+    return array
+
+
 def __normalize_lara_mocap__(array: np.array) -> np.array:
     """normalizes the mocap data array
 
@@ -122,22 +201,165 @@ def __normalize_lara_mocap__(array: np.array) -> np.array:
     return array
 
 
+_body_segments = {
+    -1: "none",
+    0: "head",
+    1: "head end",
+    2: "L collar",
+    12: "R collar",
+    6: "L humerus",
+    16: "R humerus",
+    3: "L elbow",
+    13: "R elbow",
+    9: "L wrist",
+    19: "R wrist",
+    10: "L wrist end",
+    20: "R wrist end",
+    11: "lower back",
+    21: "root",
+    4: "L femur",
+    14: "R femur",
+    7: "L tibia",
+    17: "R tibia",
+    5: "L foot",
+    15: "R foot",
+    8: "L toe",
+    18: "R toe",
+}
+
+_body_segments_reversed = {v: k for k, v in _body_segments.items()}
+
+_colors = {"r": (1, 0, 0, 1), "g": (0, 1, 0, 1), "b": (0, 0, 1, 1), "y": (1, 1, 0, 1)}
+
+# each bodysegmentline needs 2 _colors because each has a start and end.
+# different _colors on each end result in a gradient
+_skeleton_colors = (
+    _colors["b"],
+    _colors["b"],  # head
+    _colors["b"],
+    _colors["b"],  # head end
+    _colors["b"],
+    _colors["b"],  # L collar
+    _colors["g"],
+    _colors["g"],  # L elbow
+    _colors["r"],
+    _colors["r"],  # L femur
+    _colors["r"],
+    _colors["r"],  # L foot
+    _colors["g"],
+    _colors["g"],  # L humerus
+    _colors["r"],
+    _colors["r"],  # L tibia
+    _colors["r"],
+    _colors["r"],  # L toe
+    _colors["g"],
+    _colors["g"],  # L wrist
+    _colors["g"],
+    _colors["g"],  # L wrist end
+    _colors["b"],
+    _colors["b"],  # lower back
+    _colors["b"],
+    _colors["b"],  # R collar
+    _colors["g"],
+    _colors["g"],  # R elbow
+    _colors["r"],
+    _colors["r"],  # R femur
+    _colors["r"],
+    _colors["r"],  # R foot
+    _colors["g"],
+    _colors["g"],  # R humerus
+    _colors["r"],
+    _colors["r"],  # R tibia
+    _colors["r"],
+    _colors["r"],  # R toe
+    _colors["g"],
+    _colors["g"],  # R wrist
+    _colors["g"],
+    _colors["g"],  # R wrist end
+    _colors["b"],
+    _colors["b"],  # root
+)
+_skeleton_color_array = np.array(_skeleton_colors, dtype=np.float32)
+
+
+# index of the segment each of the 22 body segments is connected to (target)
+_segment_targets = [
+    2,  # 0   head      -> l collar/rcollar
+    0,  # 1   head end  -> head
+    11,  # 2 l collar    -> lowerback
+    6,  # 3 l elbow     -> l humerus
+    21,  # 4 l femur     -> root
+    7,  # 5 l foot      -> l tibia
+    2,  # 6 l humerus   -> l collar
+    4,  # 7 l tibia     -> l femur
+    5,  # 8 l toe       -> l foot
+    3,  # 9 l wrist     -> l elbow
+    9,  # 10 l wrist end -> l wrist
+    11,  # 11   lowerback -> lowerback
+    11,  # 12 r collar    -> lowerback
+    16,  # 13 r elbow     -> r humerus
+    21,  # 14 r femur     -> root
+    17,  # 15 r foot      -> r tibia
+    12,  # 16 r humerus   -> r collar
+    14,  # 17 r tibia     -> r femur
+    15,  # 18 r toe       -> r foot
+    13,  # 19 r wrist     -> r elbow
+    19,  # 20 r wrist end -> r wrist
+    11,  # 21   root      -> lowerback
+]
+
+# each segment has 6 columns, the translation (x, y, z) is stored in columns 3 to 5
+_source_columns = np.arange(22)[:, np.newaxis] * 6 + 3 + np.arange(3)
+_target_columns = np.array(_segment_targets)[:, np.newaxis] * 6 + 3 + np.arange(3)
+
+# columns of the 44 line end points (source and target alternating), shape (44, 3)
+_skeleton_columns = np.stack([_source_columns, _target_columns], axis=1).reshape(44, 3)
+
+# line end points at the feet, the lowest of them marks the floor
+_floor_points = np.array(
+    [_body_segments_reversed[i] * 2 for i in ["L toe", "R toe", "L foot", "R foot"]]
+)
+
+# how the frames are drawn, the data is in millimeters
+LARA_SKELETON = Skeleton(
+    columns=_skeleton_columns,
+    colors=_skeleton_color_array,
+    scale=0.001,
+    floor_points=_floor_points,
+)
+
+
 class LARaMocapReader(MocapReaderBase):
     """Class for reading mocap data."""
 
     def __init__(self, path, **kwargs) -> None:
         """
         Initializes a new MocapReader object.
+        Large files that have not been parsed before are read lazily.
 
         Args:
             path (Path): The path to the mocap file.
+            stream (Optional[bool]): Whether to parse rows only when they are accessed.
+                Defaults to None, which streams files larger than STREAM_THRESHOLD.
 
         Raises:
             FileNotFoundError: If the file does not exist.
         """
         self.path = path
         _normalize = kwargs.get("normalize", True)
-        self.mocap = load_lara_mocap(self.path, _normalize)
+        _probe = kwargs.get("probe") or {}
+        _header_lines = _probe.get("header_lines")
+
+        _stream = kwargs.get("stream")
+        if _stream is None:
+            _stream = os.path.getsize(path) > STREAM_THRESHOLD and not has_lara_sidecar(
+                path, _normalize
+            )
+
+        if _stream:
+            self.mocap = open_lara_mocap_lazy(self.path, _normalize, _header_lines)
+        else:
+            self.mocap = load_lara_mocap(self.path, _normalize, _header_lines)
 
     def get_frame(self, frame_idx: int) -> np.ndarray:
         """
@@ -157,23 +379,45 @@ class LARaMocapReader(MocapReaderBase):
 
         return self.mocap[frame_idx]
 
+    def get_batch(self, indices: Iterable[int]) -> np.ndarray:
+        unique, inverse = sorted_unique_indices(indices, self.get_frame_count())
+        frames = self.mocap[unique]
+        return frames if inverse is None else frames[inverse]
+
+    def read_range(self, lo: int, hi: int, step: int = 1) -> np.ndarray:
+        if lo < 0 or hi > self.get_frame_count():
+            raise IndexError("Index out of range.")
+        return self.mocap[lo:hi:step]
+
     def get_frame_count(self) -> int:
         return self.mocap.shape[0]
 
     def get_fps(self) -> float:
         return 200.0
 
+    def get_skeleton(self) -> Skeleton:
+        return LARA_SKELETON
+
+    def is_streaming(self) -> bool:
+        return isinstance(self.mocap, LazyRows)
+
     def get_path(self) -> Path:
         return self.path
 
+    @classmethod
+    def probe(cls, path: Path) -> Optional[dict]:
+        # only the header is read, loading the data is left to the constructor
+        try:
+            header_lines = __count_header_lines__(Path(path))
+        except (OSError, TypeError, ValueError):
+            return None
+        if header_lines not in [1, 5]:
+            return None
+        return {"header_lines": header_lines}
+
     @staticmethod
     def is_supported(path: Path) -> bool:
-        # TODO: improve this
-        try:
-            load_lara_mocap(Path(path), True)
-            return True
-        except:  # noqa E722
-            return False
+        return LARaMocapReader.probe(path) is not None
 
 
 register_mocap_reader(LARaMocapReader, 0)
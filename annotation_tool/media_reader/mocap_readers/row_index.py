@@ -0,0 +1,217 @@
+import abc
+from collections import OrderedDict
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from annotation_tool.file_cache import application_subdir
+from annotation_tool.utility.filehandler import checksum
+
+BLOCK_ROWS = 256  # rows parsed at once
+MAX_BLOCKS = 64  # parsed blocks kept in memory
+
+
+WHITESPACE = np.frombuffer(b" \t\r\n\v\f", dtype=np.uint8)
+
+
+def line_offsets(path: Path, skip_header: int = 0) -> np.ndarray:
+    """
+    Returns the byte offsets of the data rows of a text file.
+    Whitespace-only lines are not rows (np.loadtxt skips blank lines as well),
+    they belong to the span of the preceding row.
+    The index is built in a single pass over the raw bytes and persisted
+    in the application directory, keyed by the checksum of the file.
+
+    Args:
+        path (Path): The path to the text file.
+        skip_header (int, optional): Number of header lines to skip. Defaults to 0.
+
+    Returns:
+        np.ndarray: The start offsets of all rows followed by the end of the last row,
+            i.e. row i spans the bytes [offsets[i], offsets[i + 1]).
+    """
+    index_file = Path(
+        application_subdir("media"), f"{checksum(path)}_{skip_header}_row_offsets.npy"
+    )
+    try:
+        return np.load(index_file)
+    except (OSError, ValueError):
+        pass
+
+    start = time.perf_counter()
+    chunk_size = 16 * 2**20
+    line_ends = []
+    text_counts = []  # number of non-whitespace bytes up to each line end
+    with open(path, "rb") as f:
+        for _ in range(skip_header):
+            f.readline()
+        data_start = f.tell()
+        file_size = f.seek(0, os.SEEK_END)
+
+        f.seek(data_start)
+        pos = data_start
+        n_text = 0
+        while True:
+            buffer = f.read(chunk_size)
+            if not buffer:
+                break
+            data = np.frombuffer(buffer, dtype=np.uint8)
+            newlines = np.flatnonzero(data == 10)
+            counts = np.cumsum(~np.isin(data, WHITESPACE), dtype=np.int64) + n_text
+            line_ends.append(newlines.astype(np.int64) + pos + 1)
+            text_counts.append(counts[newlines])
+            n_text = int(counts[-1])
+            pos += len(buffer)
+
+    ends = np.concatenate(line_ends) if line_ends else np.empty(0, dtype=np.int64)
+    counts = np.concatenate(text_counts) if text_counts else np.empty(0, np.int64)
+    if ends.size == 0 or ends[-1] < file_size:
+        ends = np.append(ends, file_size)  # last row without trailing newline
+        counts = np.append(counts, n_text)
+    starts = np.concatenate(([data_start], ends[:-1])).astype(np.int64)
+    is_row = np.diff(np.concatenate(([0], counts))) > 0
+    offsets = np.append(
+        starts[is_row], ends[is_row][-1:] if is_row.any() else data_start
+    )
+
+    logging.debug(
+        f"Indexed {offsets.size - 1} rows of {path} "
+        f"in {time.perf_counter() - start:.3f} seconds."
+    )
+    try:
+        tmp = index_file.with_suffix(".part")
+        with open(tmp, "wb") as f:
+            np.save(f, offsets)
+        os.replace(tmp, index_file)
+    except OSError as e:
+        logging.warning(f"Could not persist row index for {path}: {e}")
+    return offsets
+
+
+class BlockRows(abc.ABC):
+    """
+    Array-like access to rows that are stored in blocks of equal size.
+    Blocks are materialized on access and kept in a small LRU cache.
+    Supports integer, slice and integer-array indexing along the first axis.
+    The rows are read-only, converting to an ndarray materializes all of them.
+    """
+
+    def __init__(self, n_rows: int, block_rows: int, max_blocks: int):
+        self._n_rows = n_rows
+        self.block_rows = block_rows
+        self._max_blocks = max_blocks
+
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._row_shape = ()
+        self.dtype = np.dtype(np.float64)
+
+    @abc.abstractmethod
+    def _read_block(self, block_idx: int) -> np.ndarray:
+        """
+        Materializes the rows [block_idx * block_rows, (block_idx + 1) * block_rows).
+        """
+        pass
+
+    def __len__(self) -> int:
+        return self._n_rows
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return (len(self),) + self._row_shape
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        rows = self[:]
+        return rows if dtype is None else rows.astype(dtype, copy=False)
+
+    def __getitem__(self, key) -> np.ndarray:
+        if isinstance(key, (int, np.integer)):
+            idx = int(key) + len(self) if key < 0 else int(key)
+            if not 0 <= idx < len(self):
+                raise IndexError("Index out of range.")
+            return self._block(idx // self.block_rows)[idx % self.block_rows]
+        if isinstance(key, slice):
+            key = np.arange(*key.indices(len(self)))
+
+        indices = np.asarray(key, dtype=np.int64)
+        indices = np.where(indices < 0, indices + len(self), indices)
+        if indices.size > 0 and (indices.min() < 0 or indices.max() >= len(self)):
+            raise IndexError("Index out of range.")
+
+        rows = np.empty(indices.shape + self._row_shape, dtype=self.dtype)
+        blocks = indices // self.block_rows
+        for block_idx in np.unique(blocks):
+            mask = blocks == block_idx
+            rows[mask] = self._block(int(block_idx))[indices[mask] % self.block_rows]
+        return rows
+
+    def _block(self, block_idx: int) -> np.ndarray:
+        with self._lock:
+            block = self._blocks.get(block_idx)
+            if block is not None:
+                self._blocks.move_to_end(block_idx)
+                return block
+
+        block = self._read_block(block_idx)
+        block.flags.writeable = False  # rows are views into the cached block
+
+        with self._lock:
+            self._blocks[block_idx] = block
+            while len(self._blocks) > self._max_blocks:
+                self._blocks.popitem(last=False)
+        return block
+
+
+class LazyRows(BlockRows):
+    """
+    Array-like view of the rows of a large text file.
+    Rows are only parsed when they are accessed, in blocks of BLOCK_ROWS rows.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        offsets: np.ndarray,
+        parse_block: Callable[[bytes], np.ndarray],
+        on_block: Optional[Callable[[int, np.ndarray], None]] = None,
+    ):
+        """
+        Args:
+            path (Path): The path to the text file.
+            offsets (np.ndarray): The row offsets, see line_offsets.
+            parse_block (Callable[[bytes], np.ndarray]): Parses the bytes of consecutive
+                rows into a 2D array with one row per non-blank line.
+            on_block (Optional[Callable[[int, np.ndarray], None]]): Called with the index
+                and the rows of every parsed block, e.g. to record them.
+        """
+        super().__init__(offsets.size - 1, BLOCK_ROWS, MAX_BLOCKS)
+        self.path = path
+        self._offsets = offsets
+        self._parse_block = parse_block
+        self._on_block = on_block
+
+        if len(self) > 0:
+            first = self._block(0)
+            self._row_shape = first.shape[1:]
+            self.dtype = first.dtype
+
+    def _read_block(self, block_idx: int) -> np.ndarray:
+        lo = block_idx * self.block_rows
+        hi = min(lo + self.block_rows, len(self))
+        with open(self.path, "rb") as f:
+            f.seek(self._offsets[lo])
+            buffer = f.read(self._offsets[hi] - self._offsets[lo])
+        block = self._parse_block(buffer)
+        if self._on_block is not None:
+            self._on_block(block_idx, block)
+        return block
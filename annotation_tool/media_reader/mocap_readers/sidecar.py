@@ -0,0 +1,115 @@
+import logging
+from pathlib import Path
+import threading
+from typing import Callable, Optional, Union
+
+import numpy as np
+
+from annotation_tool.utility.filehandler import checksum
+
+from .cache import get_cache, get_sidecar_store
+from .row_index import BlockRows
+
+
+def load_with_sidecar(
+    path: Path, variant: str, load_function: Callable[[], np.ndarray]
+) -> Union[np.ndarray, BlockRows]:
+    """
+    Loads parsed mocap data, parsing the file only once.
+    The parsed data is stored as a binary sidecar in the application directory,
+    so later loads map it into memory instead of parsing the file again.
+    Lookups go through the ArrayCache, whose disk tier holds the sidecars,
+    so recently used data is served from memory and the sidecars are bounded
+    in size, the least recently used ones are removed.
+
+    Args:
+        path (Path): The path to the mocap file.
+        variant (str): Distinguishes different parses of the same file, e.g. "raw".
+        load_function (Callable[[], np.ndarray]): Parses the file.
+
+    Returns:
+        Union[np.ndarray, BlockRows]: The mocap data, read-only. With compression
+            enabled in the ArrayCache, an array-like that decompresses the rows
+            it is indexed with (integer, slice or integer-array along the first axis).
+    """
+    _key = (checksum(path), variant)
+
+    _cache = get_cache()
+    mocap = _cache.get(_key)  # from memory or mapped from the sidecar
+    if mocap is not None:
+        return mocap
+
+    mocap = load_function()
+    get_sidecar_store().put(_key, mocap)  # persisted for later sessions
+    _cache[_key] = mocap
+    return _cache.get(_key, mocap)
+
+
+def has_sidecar(path: Path, variant: str) -> bool:
+    """
+    Returns whether the mocap data has already been parsed into a sidecar.
+    """
+    return (checksum(path), variant) in get_sidecar_store()
+
+
+class SidecarRecorder(object):
+    """
+    Records the blocks of a streamed mocap file into its sidecar while they are read.
+    Once every block has been read, the sidecar is committed in the background,
+    so later loads map it instead of streaming the file again.
+    """
+
+    def __init__(self, path: Path, variant: str, n_rows: int, block_rows: int):
+        """
+        Args:
+            path (Path): The path to the mocap file.
+            variant (str): Distinguishes different parses of the same file, e.g. "raw".
+            n_rows (int): The number of rows of the file.
+            block_rows (int): The number of rows per block.
+        """
+        self.path = path
+        self._key = (checksum(path), variant)
+        self._n_rows = n_rows
+        self._block_rows = block_rows
+        self._missing = set(range(-(-n_rows // block_rows)))  # blocks not read yet
+        self._data: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def record(self, block_idx: int, block: np.ndarray) -> None:
+        with self._lock:
+            if block_idx not in self._missing:
+                return  # already recorded or recording was given up
+            lo = block_idx * self._block_rows
+            if len(block) != min(self._block_rows, self._n_rows - lo):
+                logging.warning(f"Rows of {self.path} do not match its row index.")
+                self._missing.clear()
+                return
+            try:
+                if self._data is None:
+                    self._data = np.lib.format.open_memmap(
+                        get_sidecar_store().partial_path(self._key),
+                        mode="w+",
+                        dtype=block.dtype,
+                        shape=(self._n_rows,) + block.shape[1:],
+                    )
+                self._data[lo : lo + len(block)] = block
+            except OSError as e:
+                logging.warning(f"Could not write mocap sidecar for {self.path}: {e}")
+                self._missing.clear()
+                return
+            self._missing.discard(block_idx)
+            if self._missing:
+                return
+        threading.Thread(target=self.__commit__, daemon=True).start()
+
+    def __commit__(self) -> None:
+        with self._lock:
+            data, self._data = self._data, None
+        try:
+            data.flush()
+        except OSError as e:
+            logging.warning(f"Could not write mocap sidecar for {self.path}: {e}")
+            return
+        del data  # unmap before moving the file
+        get_sidecar_store().commit(self._key)
+        logging.debug(f"Stored the streamed rows of {self.path} as sidecar.")
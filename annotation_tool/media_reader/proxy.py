@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+import threading
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from annotation_tool.file_cache import application_subdir
+
+PROXY_WIDTH = 320  # width of the proxy frames in pixels
+MIN_PROXY_DURATION = 5 * 60 * 1000  # only build proxies for videos longer than 5 min
+STOP_TIMEOUT = 5  # seconds to wait for a stopped builder to clean up
+
+__builders__ = {}
+__builders_lock__ = threading.Lock()
+
+
+def proxy_path(checksum: str) -> Path:
+    """
+    Returns the location of the proxy for the video with the given checksum.
+    """
+    return Path(application_subdir("proxies"), f"{checksum}.avi")
+
+
+def proxy_frame_count(checksum: str) -> Optional[int]:
+    """
+    Returns the number of frames decoded from the original video while building
+    its proxy, None if there is no finished proxy. The frame count the container
+    reports is only an estimate, this is the real one.
+    """
+    try:
+        with open(proxy_path(checksum).with_suffix(".json"), "r") as f:
+            return int(json.load(f)["n_frames"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+class ProxyBuilder(threading.Thread):
+    """
+    Builds a small all-intra (MJPG) copy of a video in the background.
+    Every proxy frame is a keyframe, so random access into the proxy costs a
+    single seek and a small JPEG decode regardless of the original codec.
+    """
+
+    def __init__(self, path: Path, target: Path):
+        super().__init__(daemon=True)
+        self.path = path
+        self.target = target
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        start = time.perf_counter()
+        # unique per builder, so the cleanup of a stopped builder
+        # never removes the file of a builder started after it
+        fd, tmp = tempfile.mkstemp(
+            suffix=".part.avi", prefix=f"{self.target.stem}_", dir=self.target.parent
+        )
+        os.close(fd)
+        tmp = Path(tmp)
+
+        vc = cv2.VideoCapture(self.path.as_posix())
+        fps = vc.get(cv2.CAP_PROP_FPS)
+        width = int(vc.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(vc.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if not vc.isOpened() or width <= 0 or height <= 0 or fps <= 0:
+            vc.release()
+            os.remove(tmp)
+            logging.warning(f"Building proxy for {self.path} failed: unknown format.")
+            return
+
+        scale = min(1, PROXY_WIDTH / width)
+        size = (
+            max(2, round(width * scale)) // 2 * 2,
+            max(2, round(height * scale)) // 2 * 2,
+        )
+        buffer = np.empty((size[1], size[0], 3), dtype=np.uint8)
+
+        writer = cv2.VideoWriter(
+            tmp.as_posix(), cv2.VideoWriter_fourcc(*"MJPG"), fps, size
+        )
+        n_written = 0
+        reached_end = False
+        try:
+            # decoding sequentially is by far the cheapest way through the video
+            while not self._stopped.is_set():
+                ok, frame = vc.read()
+                if not ok:
+                    reached_end = True
+                    break
+                cv2.resize(frame, size, dst=buffer, interpolation=cv2.INTER_AREA)
+                writer.write(buffer)
+                n_written += 1
+        finally:
+            writer.release()
+            vc.release()
+
+        # The frame count of the container is an estimate (often wrong for
+        # AVI, MJPG or variable-frame-rate files), decoding to the end is what counts.
+        if reached_end and n_written > 0:
+            try:
+                with open(self.target.with_suffix(".json"), "w") as f:
+                    json.dump({"n_frames": n_written}, f)
+                os.replace(tmp, self.target)
+                logging.info(
+                    f"Built proxy for {self.path} ({n_written} frames) "
+                    f"in {time.perf_counter() - start:.1f} seconds."
+                )
+                return
+            except OSError as e:
+                logging.warning(f"Could not store proxy for {self.path}: {e}")
+        elif not self._stopped.is_set():
+            logging.warning(f"Building proxy for {self.path} failed: no frames.")
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def get_proxy(path: Path, checksum: str, duration: int) -> Optional[Path]:
+    """
+    Returns the location of the finished proxy for the given video.
+    If there is none yet, it is built in the background (once per video and session).
+
+    Args:
+        path (Path): The path to the original video.
+        checksum (str): The checksum of the original video.
+        duration (int): The duration of the video in milliseconds.
+
+    Returns:
+        Optional[Path]: The path to the proxy or None if it is not available (yet).
+    """
+    target = proxy_path(checksum)
+    if target.is_file():
+        return target
+    if duration < MIN_PROXY_DURATION:
+        return None
+
+    with __builders_lock__:
+        if checksum not in __builders__:
+            builder = ProxyBuilder(path, target)
+            __builders__[checksum] = builder
+            builder.start()
+    return None
+
+
+def stop_proxy_builders() -> None:
+    """
+    Stops all running proxy builders and waits for them to clean up.
+    Unfinished proxies are discarded.
+    """
+    with __builders_lock__:
+        builders = list(__builders__.values())
+    for builder in builders:
+        builder.stop()
+    for builder in builders:
+        builder.join(timeout=STOP_TIMEOUT)
+
+    with __builders_lock__:
+        for checksum, builder in list(__builders__.items()):
+            if not builder.is_alive():
+                del __builders__[checksum]  # must not block rebuilding
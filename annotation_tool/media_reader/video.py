@@ -1,11 +1,16 @@
+import copy
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional, Tuple
 
 import filetype
 import numpy as np
 
-from .base import MediaReader, register_media_reader
+from annotation_tool.utility.filehandler import checksum
+
+from .base import MediaReader, probe, register_media_reader, sorted_unique_indices
+from .frame_cache import get_frame_cache
+from .proxy import get_proxy, proxy_frame_count
 
 
 class VideoReader(MediaReader):
@@ -23,8 +28,129 @@ class VideoReader(MediaReader):
         except ValueError as e:
             raise ValueError(f"Could not load video {path}.") from e
 
+        self._timestamps = self._video_reader.get_timestamps()
+
+        # decoded frames are shared between all readers of the same file
+        self._checksum = checksum(path)
+        self._frame_cache = get_frame_cache()
+
+        self._proxy_reader = None  # low resolution copy for scrubbing
+
     def __get_frame__(self, idx: int) -> np.ndarray:
-        return self._video_reader.get_frame(idx)
+        key = (self._checksum, idx, None)
+        frame = self._frame_cache.get(key)
+        if frame is None:
+            frame = self._video_reader.get_frame(idx)
+            self._frame_cache[key] = frame
+        return frame
+
+    @property
+    def backend(self) -> str:
+        """
+        The name of the video backend that decodes the frames.
+        """
+        from .video_readers import backend_of
+
+        return backend_of(self._video_reader)
+
+    def reopen(self) -> "VideoReader":
+        """
+        Returns a reader with its own decoder for the same video and backend.
+        Decoders are not thread-safe, so every thread needs its own handle.
+        The checksum, the timestamps and the frame cache are shared,
+        only the decoder is opened again.
+        """
+        reader_class = type(self._video_reader)
+        reader = copy.copy(self)
+        reader._video_reader = reader_class(
+            self.path, probe=probe(reader_class.probe, self.path)
+        )
+        reader._proxy_reader = None  # the proxy has a decoder of its own
+        return reader
+
+    def has_proxy(self) -> bool:
+        """
+        Returns whether a low resolution proxy of the video is available.
+        If there is none yet, building it is started in the background.
+        """
+        if self._proxy_reader is None:
+            proxy = get_proxy(self.path, self._checksum, self.duration)
+            if proxy is not None:
+                from .video_readers import get_video_reader
+
+                try:
+                    proxy_reader = get_video_reader(proxy)
+                except ValueError:
+                    logging.warning(f"Could not load proxy {proxy} of {self.path}.")
+                    return False
+                # the proxy holds every frame that could be decoded, the count
+                # of the original container may be off
+                n_frames = proxy_frame_count(self._checksum)
+                expected = n_frames if n_frames is not None else len(self)
+                if proxy_reader.get_frame_count() == expected:
+                    self._proxy_reader = proxy_reader
+        return self._proxy_reader is not None
+
+    def get_scaled_frame(
+        self, idx: int, max_size: Tuple[int, int], proxy: bool = False
+    ) -> np.ndarray:
+        """
+        Returns the frame at the given index, downscaled to fit into max_size
+        while keeping the aspect ratio. Frames that already fit are returned in
+        full resolution, upscaling is left to the caller.
+
+        Args:
+            idx: The index of the frame.
+            max_size: The size (width, height) the frame has to fit into.
+            proxy: Whether the frame should be read from the low resolution proxy.
+                Cheap random access for scrubbing and fast replay.
+                Falls back to the original if there is no proxy.
+        Returns:
+            The (scaled) frame with shape (h, w, 3).
+        """
+        if idx < 0 or idx >= len(self):
+            raise IndexError("Index out of range.")
+
+        if proxy and self.has_proxy() and idx < self._proxy_reader.get_frame_count():
+            reader = self._proxy_reader
+        else:
+            reader = self._video_reader
+
+        width, height = reader.get_size()
+        scale = min(max_size[0] / width, max_size[1] / height)
+        if reader is self._proxy_reader:
+            if scale >= 1:
+                return reader.get_frame(idx)
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            return reader.get_frame_scaled(idx, size)
+
+        if scale >= 1:
+            return self[idx]
+
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        key = (self._checksum, idx, size)
+        frame = self._frame_cache.get(key)
+        if frame is None:
+            frame = self._video_reader.get_frame_scaled(idx, size)
+            self._frame_cache[key] = frame
+        return frame
+
+    def __get_batch__(self, indices: Iterable[int]) -> np.ndarray:
+        # Batches only consult the cache. Storing them would flush
+        # the frames the display is currently working with.
+        unique, inverse = sorted_unique_indices(indices, len(self))
+        cached = [self._frame_cache.peek((self._checksum, i, None)) for i in unique]
+        missing = [i for i, frame in zip(unique.tolist(), cached) if frame is None]
+
+        if not any(frame is not None for frame in cached):
+            frames = self._video_reader.get_batch(unique)
+        else:
+            decoded = iter(self._video_reader.get_batch(missing))
+            frames = np.stack(
+                [next(decoded) if frame is None else frame for frame in cached]
+            )
+
+        return frames if inverse is None else frames[inverse]
 
     def __get_frame_count__(self) -> int:
         return self._video_reader.get_frame_count()
@@ -32,6 +158,9 @@ class VideoReader(MediaReader):
     def __get_fps__(self) -> Optional[float]:
         return self._video_reader.get_fps()
 
+    def __get_timestamps__(self) -> Optional[np.ndarray]:
+        return self._timestamps
+
     def __get_path__(self) -> Path:
         return self._video_reader.get_path()
 
@@ -47,7 +176,7 @@ def __is_video__(path: Path) -> bool:
 
 
 def __video_builder__(path, **kwargs) -> VideoReader:
-    if __is_video__(path):
+    if probe(__is_video__, path):
         return VideoReader(path, **kwargs)
     else:
         raise ValueError(f"Path {path} is not a video.")
@@ -1,4 +1,7 @@
+from .base import backend_of  # noqa: F401
+from .base import get_video_backend  # noqa: F401
 from .base import get_video_reader  # noqa: F401
-
-# from .decord_reader import DecordReader  # noqa: F401
+from .base import set_video_backend  # noqa: F401
+from .base import video_backends  # noqa: F401
+from .decord_reader import DecordReader  # noqa: F401
 from .opencv_reader import OpenCvReader  # noqa: F401
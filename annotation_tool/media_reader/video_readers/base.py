@@ -1,9 +1,14 @@
 import abc
 import dataclasses
+import logging
 from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
 
+import cv2
 import numpy as np
 
+from ..base import probe, read_frames
+
 
 class VideoReaderBase(abc.ABC):
     """
@@ -36,6 +41,55 @@ class VideoReaderBase(abc.ABC):
         """
         pass
 
+    def get_frame_scaled(self, frame_idx: int, size: Tuple[int, int]) -> np.ndarray:
+        """
+        Returns the RGB-frame at the given index, scaled to the given size.
+        Readers should override this if they can scale before the color conversion.
+
+        Args:
+            frame_idx (int): The index of the frame.
+            size (Tuple[int, int]): The output size as (width, height).
+
+        Returns:
+            np.ndarray: The frame as a numpy array. The shape is (height, width, channels).
+        Raises:
+            IndexError: If the frame index is out of bounds.
+        """
+        frame = self.get_frame(frame_idx)
+        if (frame.shape[1], frame.shape[0]) == tuple(size):
+            return frame
+        return cv2.resize(frame, tuple(size), interpolation=cv2.INTER_AREA)
+
+    def get_batch(self, indices: Iterable[int]) -> np.ndarray:
+        """
+        Returns the frames at the given indices as one preallocated array.
+        The default implementation reads the sorted and deduplicated indices
+        one by one, readers should override it if they can do better.
+
+        Args:
+            indices (Iterable[int]): The indices of the frames, any order, duplicates allowed.
+
+        Returns:
+            np.ndarray: The frames in the requested order. The shape is (n, height, width, channels).
+        Raises:
+            IndexError: If any frame index is out of bounds.
+        """
+        return read_frames(self.get_frame, indices, self.get_frame_count())
+
+    def read_range(self, lo: int, hi: int, step: int = 1) -> np.ndarray:
+        """
+        Returns the frames between lo (inclusive) and hi (exclusive).
+
+        Args:
+            lo (int): The lower bound of the frame indices.
+            hi (int): The upper bound of the frame indices.
+            step (int, optional): The step size between frames. Defaults to 1.
+
+        Returns:
+            np.ndarray: The frames. The shape is (n, height, width, channels).
+        """
+        return self.get_batch(range(lo, hi, step))
+
     @abc.abstractmethod
     def get_frame_count(self) -> int:
         """
@@ -46,6 +100,16 @@ class VideoReaderBase(abc.ABC):
         """
         pass
 
+    def get_size(self) -> Tuple[int, int]:
+        """
+        Returns the size of the frames.
+
+        Returns:
+            Tuple[int, int]: The size as (width, height).
+        """
+        height, width = self.get_frame(0).shape[:2]
+        return width, height
+
     @abc.abstractmethod
     def get_fps(self) -> float:
         """
@@ -56,6 +120,16 @@ class VideoReaderBase(abc.ABC):
         """
         pass
 
+    def get_timestamps(self) -> Optional[np.ndarray]:
+        """
+        Returns the presentation times of all frames of a variable-frame-rate video.
+
+        Returns:
+            Optional[np.ndarray]: The timestamps in milliseconds
+                or None if the video has a constant framerate.
+        """
+        return None
+
     @abc.abstractmethod
     def get_path(self) -> Path:
         """
@@ -77,6 +151,22 @@ class VideoReaderBase(abc.ABC):
         """
         return False
 
+    @classmethod
+    def probe(cls, path: Path) -> Optional[dict]:
+        """
+        Cheaply checks whether the reader can open the given file, e.g. by sniffing
+        the file header. The result is passed on to the constructor as the keyword
+        argument probe, so the file only has to be opened once.
+        Readers should override this if is_supported has to load the file.
+
+        Args:
+            path (Path): The path to the video_readers file.
+
+        Returns:
+            Optional[dict]: What was learned about the file or None if it is not supported.
+        """
+        return {} if cls.is_supported(path) else None
+
 
 @dataclasses.dataclass
 class RegisteredVideoReader:
@@ -86,25 +176,78 @@ class RegisteredVideoReader:
 
     reader: VideoReaderBase
     priority: int
+    backend: str
 
 
 __registered_video_readers = []
+__preferred_backend__ = "auto"
 
 
-def register_video_reader(reader: VideoReaderBase, priority: int = 0):
+def register_video_reader(
+    reader: VideoReaderBase, priority: int = 0, backend: Optional[str] = None
+):
     """
     Registers a video_readers reader.
 
     Args:
         reader (VideoReaderBase): The video_readers reader to register.
         priority (int, optional): The priority of the reader. Defaults to 0.
+        backend (Optional[str], optional): The name the reader can be chosen by.
+            Defaults to the class name in lower case.
     """
-    __registered_video_readers.append(RegisteredVideoReader(reader, priority))
+    backend = backend if backend is not None else reader.__name__.lower()
+    __registered_video_readers.append(RegisteredVideoReader(reader, priority, backend))
     __registered_video_readers.sort(key=lambda x: x.priority, reverse=True)
 
 
+def video_backends() -> List[str]:
+    """
+    Returns the names of the registered video backends, ordered by priority.
+    """
+    return [reader.backend for reader in __registered_video_readers]
+
+
+def set_video_backend(backend: str) -> None:
+    """
+    Sets the video backend that is tried first when opening videos.
+    The other backends remain fallbacks for files the preferred one can't open.
+
+    Args:
+        backend (str): The name of a registered backend or "auto" to go by priority.
+    """
+    if backend != "auto" and backend not in video_backends():
+        logging.warning(f"Video backend {backend} is not available, using auto.")
+        backend = "auto"
+    global __preferred_backend__
+    __preferred_backend__ = backend
+
+
+def get_video_backend() -> str:
+    return __preferred_backend__
+
+
+def backend_of(reader: VideoReaderBase) -> str:
+    """
+    Returns the name of the backend the given reader was registered as.
+    """
+    for registered in __registered_video_readers:
+        if type(reader) is registered.reader:
+            return registered.backend
+    return type(reader).__name__.lower()
+
+
 def get_video_reader(path: Path) -> VideoReaderBase:
-    for reader in __registered_video_readers:
-        if reader.reader.is_supported(path):
-            return reader.reader(path)
+    # stable sort, the preferred backend moves to the front
+    readers = sorted(
+        __registered_video_readers,
+        key=lambda x: x.backend != __preferred_backend__,
+    )
+    for reader in readers:
+        _probe = probe(reader.reader.probe, path)
+        if _probe is None:
+            continue
+        try:
+            return reader.reader(path, probe=_probe)
+        except (OSError, TypeError, ValueError) as e:
+            logging.debug(f"{reader.reader.__name__} could not open {path}: {e}")
     raise ValueError(f"No video_readers reader found for {path}.")
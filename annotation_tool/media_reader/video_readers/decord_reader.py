@@ -1,24 +1,26 @@
 import logging
-import os
 from pathlib import Path
+from typing import Iterable, Optional, Tuple
 
 try:
     import decord
-
-    _use_decord = os.name == "nt"  # use decord only for windows
 except ImportError:
     logging.debug("Decord not available, falling back to OpenCV")
     decord = None
-    _use_decord = False
 
+import filetype
 import numpy as np
 
+from ..base import sorted_unique_indices
 from .base import VideoReaderBase, register_video_reader
+from .timestamps import is_variable_frame_rate
 
 
 class DecordReader(VideoReaderBase):
     """
     Video reader using decord.
+    Batches are decoded natively by decord, which visits the frames in order
+    and only seeks to keyframes when that is cheaper than decoding on.
     """
 
     def __init__(self, path: Path, **kwargs):
@@ -27,9 +29,19 @@ class DecordReader(VideoReaderBase):
 
         Args:
             path (Path): The path to the video file.
+
+        Raises:
+            ValueError: If decord can't decode the video.
         """
         self.path = path
-        self.video = decord.VideoReader(path.as_posix(), ctx=decord.cpu(0))
+        try:
+            self.video = decord.VideoReader(path.as_posix(), ctx=decord.cpu(0))
+        except (decord.DECORDError, RuntimeError) as e:
+            raise ValueError(f"Decord could not open {path}: {e}")
+
+        if len(self.video) == 0 or self.video.get_avg_fps() < 1:
+            raise ValueError(f"Decord could not read the frames of {path}.")
+        self._size = None
 
         logging.info(f"Using decord for video {path}.")
 
@@ -46,8 +58,19 @@ class DecordReader(VideoReaderBase):
         Raises:
             IndexError: If the frame index is out of bounds.
         """
+        if frame_idx < 0 or frame_idx >= self.get_frame_count():
+            raise IndexError("Index out of range.")
         return self.video[frame_idx].asnumpy()
 
+    def get_batch(self, indices: Iterable[int]) -> np.ndarray:
+        unique, inverse = sorted_unique_indices(indices, self.get_frame_count())
+        if unique.size == 0:
+            width, height = self.get_size()
+            return np.empty((0, height, width, 3), dtype=np.uint8)
+
+        frames = self.video.get_batch(unique.tolist()).asnumpy()
+        return frames if inverse is None else frames[inverse]
+
     def get_frame_count(self) -> int:
         """
         Returns the number of frames in the video.
@@ -57,6 +80,12 @@ class DecordReader(VideoReaderBase):
         """
         return len(self.video)
 
+    def get_size(self) -> Tuple[int, int]:
+        if self._size is None:
+            height, width = self.video[0].shape[:2]
+            self._size = width, height
+        return self._size
+
     def get_fps(self) -> float:
         """
         Returns the frames per second of the video.
@@ -66,9 +95,32 @@ class DecordReader(VideoReaderBase):
         """
         return self.video.get_avg_fps()
 
+    def get_timestamps(self) -> Optional[np.ndarray]:
+        # decord indexes the presentation times while opening the video
+        seconds = self.video.get_frame_timestamp(np.arange(self.get_frame_count()))
+        timestamps = (seconds[:, 0] - seconds[0, 0]) * 1000
+        if not is_variable_frame_rate(timestamps):
+            return None  # the framerate describes the video exactly
+        logging.info(f"Video {self.path} has a variable framerate.")
+        return timestamps
+
     def get_path(self) -> Path:
         return self.path
 
+    @classmethod
+    def probe(cls, path: Path) -> Optional[dict]:
+        # Sniffing the header is enough, the constructor fails if decord can't decode it.
+        # .avi files (e.g. the MJPG proxies) are left to OpenCV
+        if path.suffix.lower() == ".avi":
+            return None
+        try:
+            kind = filetype.guess(path.as_posix())
+        except (OSError, TypeError):
+            return None
+        if kind is None or not kind.mime.startswith("video/"):
+            return None
+        return {"mime": kind.mime}
+
     @staticmethod
     def is_supported(path: Path) -> bool:
         """
@@ -80,24 +132,11 @@ class DecordReader(VideoReaderBase):
         Returns:
             bool: True if the video format is supported, False otherwise.
         """
-        # dont accept .avi
-        if path.suffix == ".avi":
-            return False
-        try:
-            decord_reader = decord.VideoReader(path.as_posix())
-            if len(decord_reader) <= 10:
-                return False
-            _ = [decord_reader[i] for i in range(10)]
-
-            if decord_reader.get_avg_fps() < 1:
-                return False
-
-            return True
-        except Exception:  # noqa
-            return False
-
+        return DecordReader.probe(path) is not None
 
-if _use_decord:
-    register_video_reader(DecordReader, -1)  # too heavy on RAM
 
-logging.info("Registered DecordReader.")
+if decord is not None:
+    # too heavy on RAM to be the default, choose it with the video_backend setting
+    # for its cheap random access and batch decoding
+    register_video_reader(DecordReader, -1, "decord")
+    logging.info("Registered DecordReader.")
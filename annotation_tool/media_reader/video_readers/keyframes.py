@@ -0,0 +1,251 @@
+import bisect
+import dataclasses
+import logging
+import os
+from pathlib import Path
+import struct
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from annotation_tool.file_cache import application_subdir
+from annotation_tool.utility.filehandler import checksum, read_json, write_json
+
+
+@dataclasses.dataclass
+class KeyframeIndex:
+    """
+    Keyframe positions and measured seek/decode costs of a single video file.
+    """
+
+    keyframes: List[int]  # sorted frame indices, empty if unknown
+    seek_cost: float  # seconds for a single seek (without decoding)
+    decode_cost: float  # seconds for decoding a single frame
+
+    @property
+    def threshold(self) -> int:
+        """
+        Number of frames that can be decoded in the time of a single seek.
+        """
+        return max(1, int(round(self.seek_cost / self.decode_cost)))
+
+    def preceding_keyframe(self, idx: int) -> int:
+        """
+        Returns the nearest keyframe at or before the given index.
+        """
+        i = bisect.bisect_right(self.keyframes, idx)
+        return self.keyframes[i - 1] if i > 0 else 0
+
+    def plan(self, pos: int, idx: int) -> Optional[int]:
+        """
+        Plans how to get from the current position of the capture to the given index.
+
+        Args:
+            pos (int): The index of the next frame the capture would decode.
+            idx (int): The index of the requested frame.
+
+        Returns:
+            Optional[int]: The frame to jump to before decoding forward to idx
+                or None if decoding forward from pos is cheaper.
+        """
+        forward = pos <= idx
+        if not self.keyframes:
+            if forward and idx - pos <= self.threshold:
+                return None
+            return idx
+
+        keyframe = self.preceding_keyframe(idx)
+        if forward and pos >= keyframe:
+            return None  # jumping would land on the same GOP behind us
+
+        seek_cost = self.seek_cost + (idx - keyframe) * self.decode_cost
+        if forward and (idx - pos) * self.decode_cost <= seek_cost:
+            return None
+        return keyframe
+
+
+def keyframe_index(path: Path, vc: cv2.VideoCapture) -> KeyframeIndex:
+    """
+    Returns the keyframe index for the given video.
+    The index is computed once per video and persisted in the application directory,
+    keyed by the checksum of the file.
+
+    Args:
+        path (Path): The path to the video file.
+        vc (cv2.VideoCapture): An opened capture of the video, used for measuring the costs.
+            The capture is reset to the first frame afterwards.
+
+    Returns:
+        KeyframeIndex: The keyframe index.
+    """
+    index_file = Path(application_subdir("keyframes"), f"{checksum(path)}.json")
+    try:
+        return KeyframeIndex(**read_json(index_file))
+    except (FileNotFoundError, TypeError, ValueError):
+        pass
+
+    start = time.perf_counter()
+    n_frames = int(vc.get(cv2.CAP_PROP_FRAME_COUNT))
+    keyframes = [k for k in scan_keyframes(path) or [] if k < n_frames]
+    seek_cost, decode_cost = __measure_costs__(vc, keyframes, n_frames)
+    index = KeyframeIndex(keyframes, seek_cost, decode_cost)
+    logging.debug(
+        f"Scanned {len(keyframes)} keyframes of {path} in {time.perf_counter() - start:.3f} seconds, "
+        f"{seek_cost * 1000:.2f} ms per seek, {decode_cost * 1000:.2f} ms per frame."
+    )
+
+    try:
+        write_json(index_file, dataclasses.asdict(index))
+    except OSError as e:
+        logging.warning(f"Could not persist keyframe index for {path}: {e}")
+    return index
+
+
+def __measure_costs__(
+    vc: cv2.VideoCapture, keyframes: List[int], n_frames: int
+) -> Tuple[float, float]:
+    n_decode = max(1, min(30, n_frames - 1))
+    vc.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    start = time.perf_counter()
+    for _ in range(n_decode):
+        vc.grab()
+    decode_cost = max(1e-6, (time.perf_counter() - start) / n_decode)
+
+    # jump to keyframes if they are known, this measures the pure seek overhead.
+    # Otherwise the measured cost includes decoding from the hidden keyframe.
+    candidates = keyframes[1:] if len(keyframes) > 1 else range(n_frames)
+    targets = [candidates[int(i)] for i in np.linspace(0, len(candidates) - 1, 5)]
+    start = time.perf_counter()
+    for target in targets:
+        vc.set(cv2.CAP_PROP_POS_FRAMES, target)
+        vc.grab()
+    seek_cost = (time.perf_counter() - start) / len(targets) - decode_cost
+
+    vc.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    return max(seek_cost, decode_cost), decode_cost
+
+
+def scan_keyframes(path: Path) -> Optional[List[int]]:
+    """
+    Reads the keyframe positions from the container index without decoding the video.
+    Supported are MP4/MOV (sync sample table) and AVI (idx1 index).
+
+    Args:
+        path (Path): The path to the video file.
+
+    Returns:
+        Optional[List[int]]: The sorted keyframe indices or None if the container
+            does not provide them.
+    """
+    try:
+        with open(path, "rb") as f:
+            magic = f.read(12)
+            if magic[:4] == b"RIFF" and magic[8:12] == b"AVI ":
+                return __avi_keyframes__(f)
+            if magic[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide"):
+                return __mp4_keyframes__(f)
+    except (OSError, struct.error, ValueError) as e:
+        logging.debug(f"Scanning keyframes of {path} failed: {e}")
+    return None
+
+
+def __iter_boxes__(f, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, box_type = struct.unpack(">I4s", f.read(8))
+        header_size = 8
+        if size == 1:
+            (size,) = struct.unpack(">Q", f.read(8))
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            return
+        yield box_type, pos + header_size, pos + size
+        pos += size
+
+
+def __child__(f, start: int, end: int, box_type: bytes) -> Optional[Tuple[int, int]]:
+    for _type, _start, _end in __iter_boxes__(f, start, end):
+        if _type == box_type:
+            return _start, _end
+    return None
+
+
+def __mp4_video_track__(f) -> Optional[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """
+    Returns the (start, end) of the mdia and stbl boxes of the first video track.
+    """
+    file_size = f.seek(0, os.SEEK_END)
+    moov = __child__(f, 0, file_size, b"moov")
+    if moov is None:
+        return None
+
+    for box_type, trak_start, trak_end in __iter_boxes__(f, *moov):
+        if box_type != b"trak":
+            continue
+        mdia = __child__(f, trak_start, trak_end, b"mdia")
+        hdlr = mdia and __child__(f, *mdia, b"hdlr")
+        if hdlr is None:
+            continue
+        f.seek(hdlr[0] + 8)  # skip version, flags and pre_defined
+        if f.read(4) != b"vide":
+            continue
+
+        minf = __child__(f, *mdia, b"minf")
+        stbl = minf and __child__(f, *minf, b"stbl")
+        if stbl is None:
+            return None
+        return mdia, stbl
+    return None
+
+
+def __mp4_keyframes__(f) -> Optional[List[int]]:
+    track = __mp4_video_track__(f)
+    if track is None:
+        return None
+    _, stbl = track
+
+    stss = __child__(f, *stbl, b"stss")
+    if stss is None:
+        # no sync sample table -> every sample is a keyframe
+        stsz = __child__(f, *stbl, b"stsz")
+        if stsz is None:
+            return None
+        f.seek(stsz[0] + 8)  # skip version, flags and sample_size
+        (n_samples,) = struct.unpack(">I", f.read(4))
+        return list(range(n_samples))
+
+    f.seek(stss[0] + 4)  # skip version and flags
+    (n_entries,) = struct.unpack(">I", f.read(4))
+    entries = np.frombuffer(f.read(4 * n_entries), dtype=">u4")
+    return (entries.astype(np.int64) - 1).tolist()  # sample numbers are 1-based
+
+
+def __avi_keyframes__(f) -> Optional[List[int]]:
+    file_size = f.seek(0, os.SEEK_END)
+    pos = 12
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        chunk_id, size = struct.unpack("<4sI", f.read(8))
+        if chunk_id == b"idx1":
+            entry_type = np.dtype(
+                [("ckid", "S4"), ("flags", "<u4"), ("offset", "<u4"), ("size", "<u4")]
+            )
+            entries = np.frombuffer(
+                f.read(size - size % entry_type.itemsize), dtype=entry_type
+            )
+            is_video = np.array(
+                [ckid[2:] in (b"dc", b"db") for ckid in entries["ckid"]]
+            )
+            if not is_video.any():
+                return None
+            stream = entries["ckid"][np.argmax(is_video)][:2]
+            is_video &= np.array([ckid[:2] == stream for ckid in entries["ckid"]])
+            flags = entries["flags"][is_video]
+            return np.flatnonzero(flags & 0x10).tolist()  # AVIIF_KEYFRAME
+        pos += 8 + size + size % 2  # chunks are padded to even sizes
+    return None
@@ -1,12 +1,16 @@
 from functools import lru_cache
 import logging
 from pathlib import Path
-from typing import Tuple
+from typing import Iterable, Optional, Tuple
 
 import cv2
+import filetype
 import numpy as np
 
+from ..base import sorted_unique_indices
 from .base import VideoReaderBase
+from .keyframes import keyframe_index
+from .timestamps import frame_timestamps, is_variable_frame_rate
 
 
 def __get_vc__(path: Path) -> cv2.VideoCapture:
@@ -47,11 +51,34 @@ class OpenCvReader(VideoReaderBase):
         self.path = path
         self.media = __get_vc__(path)
 
-        self.FAST_SEEK_THRESHOLD = 7  # number of frames to skip instead of seeking
+        self._keyframe_index = keyframe_index(path, self.media)
+        # number of frames to skip instead of seeking, measured per file
+        self.FAST_SEEK_THRESHOLD = self._keyframe_index.threshold
 
         logging.info(f"Using OpenCV for video {path}.")
 
     def get_frame(self, frame_idx: int) -> np.ndarray:
+        frame = self._read_bgr(frame_idx)
+        if frame is None:
+            return np.zeros((self.get_height(), self.get_width(), 3), dtype=np.uint8)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def get_frame_scaled(self, frame_idx: int, size: Tuple[int, int]) -> np.ndarray:
+        width, height = size
+        if (width, height) == self.get_size():
+            return self.get_frame(frame_idx)
+
+        frame = self._read_bgr(frame_idx)
+        if frame is None:
+            return np.zeros((height, width, 3), dtype=np.uint8)
+
+        # Scale before the color conversion, so only the small image is converted.
+        # The conversion runs in place, a single array is allocated per frame
+        # and owned by the caller (frames are kept in the FrameCache).
+        scaled = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(scaled, cv2.COLOR_BGR2RGB, dst=scaled)
+
+    def _read_bgr(self, frame_idx: int) -> Optional[np.ndarray]:
         if frame_idx < 0 or frame_idx >= self.get_frame_count():
             raise IndexError("Index out of range.")
 
@@ -60,14 +87,37 @@ class OpenCvReader(VideoReaderBase):
         except AssertionError as e:
             print(repr(e))
             logging.error(f"Seeking to frame {frame_idx} failed.")
-            return np.zeros((self.get_height(), self.get_width(), 3), dtype=np.uint8)
+            return None
 
         ok, frame = self.media.read()
         if ok:
-            return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            return frame
         else:
             logging.error(f"Reading frame {frame_idx} failed.")
-            return np.zeros((self.get_height(), self.get_width(), 3), dtype=np.uint8)
+            return None
+
+    def get_batch(self, indices: Iterable[int]) -> np.ndarray:
+        unique, inverse = sorted_unique_indices(indices, self.get_frame_count())
+        frames = np.zeros(
+            (unique.size, self.get_height(), self.get_width(), 3), dtype=np.uint8
+        )
+
+        # visiting the indices in sorted order lets the seek planner decode
+        # each run of nearby frames sequentially instead of seeking per frame
+        for i, frame_idx in enumerate(unique.tolist()):
+            try:
+                self._seek(frame_idx)
+            except AssertionError as e:
+                logging.error(f"Seeking to frame {frame_idx} failed: {e}")
+                continue
+
+            ok, frame = self.media.read()
+            if ok:
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frames[i])
+            else:
+                logging.error(f"Reading frame {frame_idx} failed.")
+
+        return frames if inverse is None else frames[inverse]
 
     @property
     def current_position(self):
@@ -80,15 +130,11 @@ class OpenCvReader(VideoReaderBase):
         if idx == pos:
             return
 
-        backward_seek = idx < pos
-
-        delta = abs(idx - pos)
-        distant_forward_seek = delta > self.FAST_SEEK_THRESHOLD
-
-        if backward_seek or distant_forward_seek:
-            self._set_cap_pos(idx)
-        else:
-            self._skip_frames(idx - self.current_position)
+        # jump to the nearest preceding keyframe unless decoding forward is cheaper
+        jump_target = self._keyframe_index.plan(pos, idx)
+        if jump_target is not None:
+            self._set_cap_pos(jump_target)
+        self._skip_frames(idx - self.current_position)
 
         assert (
             self.current_position == idx
@@ -99,7 +145,7 @@ class OpenCvReader(VideoReaderBase):
 
     def _skip_frames(self, frames_to_skip) -> None:
         for _ in range(frames_to_skip):
-            self.media.read()
+            self.media.grab()
 
     @lru_cache(maxsize=1)
     def get_frame_count(self) -> int:
@@ -120,9 +166,29 @@ class OpenCvReader(VideoReaderBase):
     def get_size(self) -> Tuple[int, int]:
         return self.get_width(), self.get_height()
 
+    def get_timestamps(self) -> Optional[np.ndarray]:
+        timestamps = frame_timestamps(self.path)
+        if timestamps is None or timestamps.size != self.get_frame_count():
+            return None
+        if not is_variable_frame_rate(timestamps):
+            return None  # the framerate describes the video exactly
+        logging.info(f"Video {self.path} has a variable framerate.")
+        return timestamps
+
     def get_path(self) -> Path:
         return self.path
 
+    @classmethod
+    def probe(cls, path: Path) -> Optional[dict]:
+        # Sniffing the header is enough, the constructor fails if OpenCV can't decode it.
+        try:
+            kind = filetype.guess(path.as_posix())
+        except (OSError, TypeError):
+            return None
+        if kind is None or not kind.mime.startswith("video/"):
+            return None
+        return {"mime": kind.mime}
+
     @staticmethod
     def is_supported(path: Path) -> bool:
         try:
@@ -143,5 +209,5 @@ class OpenCvReader(VideoReaderBase):
 
 from .base import register_video_reader
 
-register_video_reader(OpenCvReader, 0)
+register_video_reader(OpenCvReader, 0, "opencv")
 logging.info("Registered OpenCvReader.")
@@ -0,0 +1,127 @@
+import logging
+import os
+from pathlib import Path
+import struct
+import time
+from typing import Optional
+
+import numpy as np
+
+from annotation_tool.file_cache import application_subdir
+from annotation_tool.utility.filehandler import checksum
+
+from .keyframes import __child__, __mp4_video_track__
+
+
+def frame_timestamps(path: Path) -> Optional[np.ndarray]:
+    """
+    Returns the presentation timestamps of all frames of the given video.
+    The index is computed once per video and persisted in the application directory,
+    keyed by the checksum of the file.
+
+    Args:
+        path (Path): The path to the video file.
+
+    Returns:
+        Optional[np.ndarray]: The timestamps in milliseconds (float64, ascending,
+            starting at 0) or None if the container does not provide them.
+    """
+    index_file = Path(application_subdir("timestamps"), f"{checksum(path)}.npy")
+    try:
+        timestamps = np.load(index_file)
+        return timestamps if timestamps.size > 0 else None
+    except (OSError, ValueError):
+        pass
+
+    start = time.perf_counter()
+    timestamps = scan_timestamps(path)
+    logging.debug(
+        f"Scanned timestamps of {path} in {time.perf_counter() - start:.3f} seconds."
+    )
+
+    try:
+        tmp = index_file.with_suffix(".part")
+        with open(tmp, "wb") as f:
+            # an empty index remembers that there are no timestamps
+            np.save(f, timestamps if timestamps is not None else np.empty(0))
+        os.replace(tmp, index_file)
+    except OSError as e:
+        logging.warning(f"Could not persist timestamps of {path}: {e}")
+    return timestamps
+
+
+def is_variable_frame_rate(timestamps: np.ndarray, tolerance: float = 0.5) -> bool:
+    """
+    Returns whether the frame durations vary by more than tolerance milliseconds.
+    """
+    if timestamps.size < 3:
+        return False
+    durations = np.diff(timestamps)
+    return float(durations.max() - durations.min()) > tolerance
+
+
+def scan_timestamps(path: Path) -> Optional[np.ndarray]:
+    """
+    Reads the presentation timestamps from the container index without decoding.
+    Supported are MP4/MOV (time-to-sample and composition offset tables).
+
+    Args:
+        path (Path): The path to the video file.
+
+    Returns:
+        Optional[np.ndarray]: The timestamps in milliseconds in presentation order
+            or None if the container does not provide them.
+    """
+    try:
+        with open(path, "rb") as f:
+            magic = f.read(12)
+            if magic[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide"):
+                return __mp4_timestamps__(f)
+    except (OSError, struct.error, ValueError) as e:
+        logging.debug(f"Scanning timestamps of {path} failed: {e}")
+    return None
+
+
+def __mp4_timestamps__(f) -> Optional[np.ndarray]:
+    track = __mp4_video_track__(f)
+    if track is None:
+        return None
+    mdia, stbl = track
+
+    mdhd = __child__(f, *mdia, b"mdhd")
+    stts = __child__(f, *stbl, b"stts")
+    if mdhd is None or stts is None:
+        return None
+
+    f.seek(mdhd[0])
+    version = f.read(1)[0]
+    f.seek(mdhd[0] + (20 if version == 1 else 12))  # skip to the timescale
+    (timescale,) = struct.unpack(">I", f.read(4))
+    if timescale == 0:
+        return None
+
+    # decoding timestamps from the sample durations
+    f.seek(stts[0] + 4)  # skip version and flags
+    (n_entries,) = struct.unpack(">I", f.read(4))
+    entries = np.frombuffer(f.read(8 * n_entries), dtype=">u4").reshape(-1, 2)
+    durations = np.repeat(entries[:, 1].astype(np.int64), entries[:, 0])
+    if durations.size == 0:
+        return None
+    timestamps = np.concatenate(([0], np.cumsum(durations)[:-1]))
+
+    # composition offsets reorder the frames for presentation (B-frames)
+    ctts = __child__(f, *stbl, b"ctts")
+    if ctts is not None:
+        f.seek(ctts[0])
+        signed = f.read(1)[0] == 1
+        f.seek(ctts[0] + 4)
+        (n_entries,) = struct.unpack(">I", f.read(4))
+        entries = np.frombuffer(f.read(8 * n_entries), dtype=">u4").reshape(-1, 2)
+        offsets = np.ascontiguousarray(entries[:, 1])
+        offsets = offsets.view(">i4") if signed else offsets
+        offsets = np.repeat(offsets.astype(np.int64), entries[:, 0])
+        if offsets.size == timestamps.size:
+            timestamps = np.sort(timestamps + offsets)
+
+    timestamps = timestamps - timestamps[0] if timestamps.size > 0 else timestamps
+    return timestamps * 1000.0 / timescale
@@ -144,8 +144,7 @@ def __run_network__(file: Path, start: int, end: int, num_labels: int) -> np.nda
         0 <= indices.min() <= middle_frame <= indices.max() < len(mr)
     ), f"{indices.min() = } | {middle_frame = } | {indices.max() = } | {len(mr) = }"
 
-    data = [mr[idx.item()] for idx in indices]
-    data = np.array(data)
+    data = mr.get_batch(indices)
 
     y = __forward__(data, model)
 
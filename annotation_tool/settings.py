@@ -13,12 +13,16 @@ class Settings:
     font_size: int = field(init=False, default=10)
     logging_level: int = field(init=False, default=logging.WARNING)
     merging_mode: str = field(init=False, default="into")
+    playback_lag_budget: int = field(init=False, default=100)  # ms
     preferred_width: int = field(init=False, default=1200)
     preferred_height: int = field(init=False, default=700)
     timeline_design: str = field(init=False, default="rounded")
     retrieval_segment_overlap: float = field(init=False, default=0)
     retrieval_segment_size: int = field(init=False, default=200)
+    show_performance_hud: bool = field(init=False, default=False)
     small_skip: int = field(init=False, default=1)
+    video_backend: str = field(init=False, default="auto")
+    video_decode_process: bool = field(init=False, default=False)
 
     def reset(self):
         for fld in fields(self):
@@ -0,0 +1,125 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import io
+import logging
+import multiprocessing
+import os
+from pathlib import Path
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+CHUNK_SIZE = 16 * 2**20  # bytes per chunk
+PARALLEL_THRESHOLD = 32 * 2**20  # smaller files are not worth starting processes
+
+
+def parse_csv(
+    path: Path,
+    delimiter: str = ",",
+    skip_header: int = 0,
+    dtype: np.dtype = np.float64,
+    allow_missing: bool = True,
+    n_workers: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Parses a numeric csv-file in chunks.
+    The file is split at line boundaries into byte ranges that are parsed
+    on a process pool (for large files) and copied into one preallocated array.
+
+    Args:
+        path (Path): Path to the csv-file.
+        delimiter (str, optional): Column delimiter. Defaults to ",".
+        skip_header (int, optional): Number of header lines to skip. Defaults to 0.
+        dtype (np.dtype, optional): dtype of the returned array. Defaults to np.float64.
+        allow_missing (bool, optional): If True, missing or invalid values are read
+            as NaN (like np.genfromtxt), otherwise they raise a ValueError.
+            Defaults to True.
+        n_workers (Optional[int], optional): Number of worker processes.
+            Defaults to the number of CPUs.
+
+    Raises:
+        ValueError: Raised if the rows have different numbers of columns
+            or if a value is invalid and allow_missing is False.
+
+    Returns:
+        np.ndarray: 2D array with one row per data line.
+    """
+    start = time.perf_counter()
+    chunks = __split_chunks__(path, skip_header)
+    if not chunks:
+        return np.empty((0, 0), dtype=dtype)
+
+    args = [(path, lo, hi, delimiter, allow_missing) for lo, hi in chunks]
+    n_workers = n_workers or os.cpu_count() or 1
+    n_bytes = chunks[-1][1] - chunks[0][0]
+    parallel = n_workers > 1 and len(chunks) > 1 and n_bytes > PARALLEL_THRESHOLD
+
+    parts = None
+    if parallel:
+        try:
+            # forking a process with Qt and decoder threads running can deadlock
+            with ProcessPoolExecutor(
+                min(n_workers, len(chunks)),
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as executor:
+                parts = list(executor.map(__parse_chunk__, *zip(*args)))
+        except (BrokenProcessPool, OSError) as e:
+            logging.warning(f"Parsing {path} in parallel failed: {e}")
+    if parts is None:
+        parts = [__parse_chunk__(*arg) for arg in args]
+
+    parts = [p for p in parts if p.shape[0] > 0]
+    if not parts:
+        return np.empty((0, 0), dtype=dtype)
+    n_columns = parts[0].shape[1]
+    if any(p.shape[1] != n_columns for p in parts):
+        raise ValueError(f"Inconsistent number of columns in {path}.")
+
+    data = np.empty((sum(p.shape[0] for p in parts), n_columns), dtype=dtype)
+    row = 0
+    for p in parts:
+        data[row : row + p.shape[0]] = p
+        row += p.shape[0]
+
+    logging.debug(
+        f"Parsed {path} ({data.shape}) in {len(parts)} chunks "
+        f"in {time.perf_counter() - start:.3f} seconds."
+    )
+    return data
+
+
+def __split_chunks__(path: Path, skip_header: int) -> List[Tuple[int, int]]:
+    with open(path, "rb") as f:
+        for _ in range(skip_header):
+            f.readline()
+        start = f.tell()
+        file_size = f.seek(0, os.SEEK_END)
+
+        bounds = [start]
+        while bounds[-1] < file_size:
+            f.seek(min(bounds[-1] + CHUNK_SIZE, file_size))
+            f.readline()  # move to the end of the current line
+            bounds.append(min(f.tell(), file_size))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def __parse_chunk__(
+    path: Path, lo: int, hi: int, delimiter: str, allow_missing: bool
+) -> np.ndarray:
+    with open(path, "rb") as f:
+        f.seek(lo)
+        buffer = f.read(hi - lo)
+
+    try:
+        # the C-parser of loadtxt is fast but fails on missing values
+        return np.loadtxt(
+            io.BytesIO(buffer), delimiter=delimiter, dtype=np.float64, ndmin=2
+        )
+    except ValueError:
+        if not allow_missing:
+            raise
+    data = np.genfromtxt(
+        io.BytesIO(buffer), delimiter=delimiter, dtype=np.float64, ndmin=2
+    )
+    return data if data.size > 0 else data.reshape(0, 0)
@@ -1,3 +1,7 @@
+import atexit
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
 import csv
 import hashlib
 import json
@@ -6,7 +10,9 @@ import logging.config
 import os
 from pathlib import Path
 import string
-from typing import List, Tuple, Union
+import tempfile
+import threading
+from typing import Any, Callable, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
 
@@ -23,6 +29,115 @@ def is_non_zero_file(path: Path) -> bool:
     return path.is_file() and os.path.getsize(path) > 0
 
 
+class JsonStore:
+    """
+    Dictionary that is persisted as a JSON file.
+    Changes are written in batches: the first unsaved change schedules a save
+    SAVE_DELAY seconds later, pending changes are flushed at exit.
+    Every save writes its own temporary file, which atomically replaces the store.
+    Within deferred(), no save is scheduled until the block is left.
+    If max_entries is given, the least recently used entries are evicted.
+    """
+
+    SAVE_DELAY = 2.0  # seconds
+
+    def __init__(self, file: Callable[[], Path], max_entries: Optional[int] = None):
+        """
+        Args:
+            file (Callable[[], Path]): Returns the location of the JSON file.
+            max_entries (Optional[int]): The maximum number of entries.
+        """
+        self._file = file
+        self._max_entries = max_entries
+        self._entries = None  # loaded lazily
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # serializes writing the file
+        self._timer = None  # pending save
+        self._dirty = False  # changes that are not saved yet
+        self._deferred = 0  # nesting depth of deferred()
+        atexit.register(self.flush)
+
+    @property
+    def file(self) -> Path:
+        return self._file()
+
+    def _load(self) -> OrderedDict:
+        if self._entries is None:
+            try:
+                with open(self.file, "r") as f:
+                    self._entries = OrderedDict(json.load(f))
+            except (OSError, ValueError):
+                self._entries = OrderedDict()
+        return self._entries
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entries = self._load()
+            if key not in entries:
+                return default
+            entries.move_to_end(key)  # recently used
+            return entries[key]
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            entries = self._load()
+            entries[key] = value
+            entries.move_to_end(key)
+            while self._max_entries is not None and len(entries) > self._max_entries:
+                entries.popitem(last=False)  # least recently used first
+            self._dirty = True
+            self._schedule()
+
+    @contextlib.contextmanager
+    def deferred(self):
+        """
+        Collects the changes made within the block into a single save.
+        """
+        with self._lock:
+            self._deferred += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._deferred -= 1
+                self._schedule()
+
+    def _schedule(self) -> None:
+        # expects the lock to be held
+        if self._dirty and self._deferred == 0 and self._timer is None:
+            self._timer = threading.Timer(self.SAVE_DELAY, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> None:
+        """
+        Writes pending changes to the file.
+        """
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return  # nothing changed since the last save
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                self._dirty = False
+                entries = dict(self._load())
+
+            file = self.file
+            try:
+                with tempfile.NamedTemporaryFile(
+                    "w", dir=file.parent, suffix=".tmp", delete=False
+                ) as f:
+                    json.dump(entries, f)
+                os.replace(f.name, file)
+            except OSError as e:
+                logging.warning(f"Could not write {file}: {e}")
+                try:
+                    os.remove(f.name)
+                except (OSError, NameError):
+                    pass
+
+
 def __approx_md5__(path: Path, n_blocks=20, block_size=2**12) -> str:
     m = hashlib.md5()
 
@@ -59,10 +174,47 @@ def __approx_md5__(path: Path, n_blocks=20, block_size=2**12) -> str:
     return m.hexdigest()
 
 
+class __ChecksumMemo:
+    """
+    Remembers computed checksums by (device, inode, size, mtime_ns) of the file.
+    The memo is persisted in the application directory, so files are only
+    hashed again after they have been modified.
+    The least recently used entries are dropped beyond MAX_ENTRIES.
+    """
+
+    MAX_ENTRIES = 10000
+
+    def __init__(self):
+        self._store = JsonStore(lambda: self.file, max_entries=self.MAX_ENTRIES)
+
+    @property
+    def file(self) -> Path:
+        from annotation_tool.file_cache import application_path
+
+        return Path(application_path(), "checksums.json")
+
+    @staticmethod
+    def key(stat: os.stat_result) -> str:
+        return f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def get(self, key: str) -> Optional[str]:
+        return self._store.get(key)
+
+    def put(self, key: str, value: str) -> None:
+        self._store.put(key, value)
+
+    def deferred(self):
+        return self._store.deferred()
+
+
+__checksum_memo__ = __ChecksumMemo()
+
+
 def checksum(path: Path) -> str:
     """Return unique ID for the given path. The ID is computed by
     hashing some parts of the file and appending the file-size.
     The runtime of this function is independent of the file-size and only depends on the number of blocks and the block-size.
+    Computed IDs are memoized until the file is modified.
 
     Note: This is not a cryptographic hash-function and should not be used as such.
 
@@ -71,14 +223,42 @@ def checksum(path: Path) -> str:
     Returns:
         str: Hash-value computed for the specified file.
     """
-    if is_non_zero_file(path):
-        _md5 = __approx_md5__(path)
-        _size = os.path.getsize(path)
-        res = f"{_md5}_{_size}B"
-        return res
-    else:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        stat = None
+    if stat is None or not path.is_file() or stat.st_size == 0:
         raise FileNotFoundError(f"File {path} does not exist or is empty.")
 
+    key = __checksum_memo__.key(stat)
+    res = __checksum_memo__.get(key)
+    if res is None:
+        _md5 = __approx_md5__(path)
+        res = f"{_md5}_{stat.st_size}B"
+        __checksum_memo__.put(key, res)
+    return res
+
+
+def checksum_many(paths: Iterable[Path], max_workers: int = 8) -> List[str]:
+    """Return the IDs of many files at once, see checksum.
+    The files are hashed on a thread pool, which hides the latency of
+    network-mounted storage. The memo is saved once after the whole batch.
+
+    Args:
+        paths (Iterable[Path]): Locations of the files.
+        max_workers (int, optional): Maximum number of threads. Defaults to 8.
+    Returns:
+        List[str]: Hash-values in the order of the given paths.
+    Raises:
+        FileNotFoundError: Raised if any file does not exist or is empty.
+    """
+    paths = list(paths)
+    if not paths:
+        return []
+    with __checksum_memo__.deferred():
+        with ThreadPoolExecutor(max(1, min(max_workers, len(paths)))) as executor:
+            return list(executor.map(checksum, paths))
+
 
 def read_json(path: Path) -> dict:
     """Try reading .json-file from the specified path.
@@ -184,10 +364,13 @@ def read_csv(
         ValueError: Raised if NaN_behavior is not a valid input.
 
     Returns:
-        np.ndarray: Array containing the raw data.
+        np.ndarray: 2D array containing the raw data, one row per data line
+        (also for files with a single data line).
     """
+    from .csv_parser import parse_csv
+
     n_headers, delimiter = __sniff_csv__(path)
-    data = np.genfromtxt(path, delimiter=delimiter, skip_header=n_headers)
+    data = parse_csv(path, delimiter=delimiter, skip_header=n_headers)
 
     if NaN_behavior is None or NaN_behavior == "keep":
         pass
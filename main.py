@@ -1,4 +1,5 @@
 import ctypes
+import multiprocessing
 from sys import platform
 import warnings
 
@@ -22,4 +23,5 @@ def start():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # worker processes of the frozen app
     start()